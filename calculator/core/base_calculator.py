@@ -2,8 +2,20 @@
 Abstract base classes for calculator modes.
 """
 from abc import ABC, abstractmethod
+from .user_functions import FunctionRegistry
 
 class CalculatorMode(ABC):
+    def __init__(self):
+        self.functions = FunctionRegistry(self.namespace())
+
+    def namespace(self) -> dict:
+        """Built-in names that user-defined functions may refer to."""
+        return {}
+
+    def define(self, definition: str) -> str:
+        """Compile and register a definition such as 'f(x) = x^2'. Returns the function name."""
+        return self.functions.define(definition)
+
     @abstractmethod
     def calculate(self, expression: str) -> float:
         """Evaluate the given expression and return the result."""
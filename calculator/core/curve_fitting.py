@@ -0,0 +1,367 @@
+"""
+Least-squares fitting of model expressions such as ``a*exp(b*x)`` or
+``poly3`` to (x, y) datasets.
+
+Models are differentiated symbolically with respect to each parameter. If
+no derivative depends on a parameter the model is linear and is solved in
+closed form; otherwise a vectorized Levenberg-Marquardt loop runs on the
+analytic Jacobian, falling back to finite differences for columns that
+cannot be differentiated (e.g. calls to user-defined functions).
+"""
+import ast
+import re
+import time
+
+import numpy as np
+
+from .user_functions import FunctionRegistry, array_namespace, compile_node, parse_expression
+
+_POLY_RE = re.compile(r"^\s*poly(\d+)\s*$")
+
+DEFAULT_INITIAL = 1.0
+DEFAULT_MAX_ITERATIONS = 100
+DEFAULT_TOLERANCE = 1e-10
+# Nonlinear fits on more points than this first converge on an evenly
+# strided subsample, then polish on the full data in a few iterations.
+SUBSAMPLE_SIZE = 20000
+# If the subsample fit does not converge, the full data only gets this many
+# iterations: the fit is poor either way and each one costs O(N).
+UNCONVERGED_POLISH_ITERATIONS = 5
+# Above this (column-scaled) condition number the normal equations lose
+# too much precision and the full least-squares solve is used instead.
+MAX_NORMAL_CONDITION = 1e10
+
+
+class FitResult:
+    def __init__(self, model, params, rss, r_squared, iterations, converged, linear, predict):
+        self.model = model
+        self.params = params  # name -> value, in model order
+        self.rss = rss
+        self.r_squared = r_squared
+        self.iterations = iterations
+        self.converged = converged
+        self.linear = linear
+        self.predict = predict  # x array -> fitted model values
+
+    def __str__(self):
+        values = ", ".join(f"{name} = {value:.6g}" for name, value in self.params.items())
+        status = "" if self.converged else ", did not converge"
+        return f"{values} (R² = {self.r_squared:.6f}{status})"
+
+
+def expand_model(model):
+    """Expand shorthands: ``polyN`` becomes ``p0 + p1*x + ... + pN*x^N``."""
+    match = _POLY_RE.match(model)
+    if not match:
+        return model
+    degree = int(match.group(1))
+    return " + ".join(["p0"] + [f"p{k}*x" + (f"^{k}" if k > 1 else "") for k in range(1, degree + 1)])
+
+
+def model_parameters(node, known):
+    """Free names of a model, in order of first appearance, excluding x and known names."""
+    names = sorted((n for n in ast.walk(node) if isinstance(n, ast.Name)),
+                   key=lambda n: (n.lineno, n.col_offset))
+    params = []
+    for child in names:
+        if child.id != 'x' and child.id not in known and child.id not in params:
+            params.append(child.id)
+    return params
+
+
+# ---------------------------------------------------------------------------
+# Symbolic differentiation on expression ASTs. Helpers fold zeros and ones so
+# the derivative of a linear model comes out free of its parameters.
+
+def _num(value):
+    return ast.Constant(value)
+
+
+def _is_num(node, value):
+    return isinstance(node, ast.Constant) and node.value == value
+
+
+def _add(a, b):
+    if _is_num(a, 0):
+        return b
+    if _is_num(b, 0):
+        return a
+    return ast.BinOp(a, ast.Add(), b)
+
+
+def _sub(a, b):
+    if _is_num(b, 0):
+        return a
+    if _is_num(a, 0):
+        return _neg(b)
+    return ast.BinOp(a, ast.Sub(), b)
+
+
+def _mul(a, b):
+    if _is_num(a, 0) or _is_num(b, 0):
+        return _num(0)
+    if _is_num(a, 1):
+        return b
+    if _is_num(b, 1):
+        return a
+    return ast.BinOp(a, ast.Mult(), b)
+
+
+def _div(a, b):
+    if _is_num(a, 0):
+        return _num(0)
+    if _is_num(b, 1):
+        return a
+    return ast.BinOp(a, ast.Div(), b)
+
+
+def _pow(a, b):
+    if _is_num(b, 1):
+        return a
+    return ast.BinOp(a, ast.Pow(), b)
+
+
+def _neg(a):
+    if _is_num(a, 0):
+        return a
+    return ast.UnaryOp(ast.USub(), a)
+
+
+def _call(name, *args):
+    return ast.Call(ast.Name(name, ast.Load()), list(args), [])
+
+
+def _depends(node, name):
+    return any(isinstance(n, ast.Name) and n.id == name for n in ast.walk(node))
+
+
+# d/du f(u) for single-argument built-ins, as a function of u
+_CHAIN_RULES = {
+    'sin': lambda u: _call('cos', u),
+    'cos': lambda u: _neg(_call('sin', u)),
+    'tan': lambda u: _div(_num(1), _pow(_call('cos', u), _num(2))),
+    'exp': lambda u: _call('exp', u),
+    'ln': lambda u: _div(_num(1), u),
+    'log': lambda u: _div(_num(1), _mul(u, _call('ln', _num(10)))),
+    'log10': lambda u: _div(_num(1), _mul(u, _call('ln', _num(10)))),
+    'sqrt': lambda u: _div(_num(1), _mul(_num(2), _call('sqrt', u))),
+    'sinh': lambda u: _call('cosh', u),
+    'cosh': lambda u: _call('sinh', u),
+    'tanh': lambda u: _sub(_num(1), _pow(_call('tanh', u), _num(2))),
+    'atan': lambda u: _div(_num(1), _add(_num(1), _pow(u, _num(2)))),
+    'asin': lambda u: _div(_num(1), _call('sqrt', _sub(_num(1), _pow(u, _num(2))))),
+    'acos': lambda u: _neg(_div(_num(1), _call('sqrt', _sub(_num(1), _pow(u, _num(2)))))),
+    'abs': lambda u: _div(u, _call('abs', u)),
+}
+
+
+def differentiate(node, name):
+    """
+    Derivative of an expression AST with respect to ``name``, or None when
+    some part of it (a user function, a conditional) has no rule.
+    """
+    if not _depends(node, name):
+        return _num(0)
+    if isinstance(node, ast.Name):
+        return _num(1)
+    if isinstance(node, ast.UnaryOp):
+        inner = differentiate(node.operand, name)
+        if inner is None:
+            return None
+        return _neg(inner) if isinstance(node.op, ast.USub) else inner
+    if isinstance(node, ast.BinOp):
+        a, b = node.left, node.right
+        da, db = differentiate(a, name), differentiate(b, name)
+        if da is None or db is None:
+            return None
+        if isinstance(node.op, ast.Add):
+            return _add(da, db)
+        if isinstance(node.op, ast.Sub):
+            return _sub(da, db)
+        if isinstance(node.op, ast.Mult):
+            return _add(_mul(da, b), _mul(a, db))
+        if isinstance(node.op, ast.Div):
+            return _div(_sub(_mul(da, b), _mul(a, db)), _pow(b, _num(2)))
+        if isinstance(node.op, ast.Pow):
+            if not _depends(b, name):
+                return _mul(_mul(b, _pow(a, _sub(b, _num(1)))), da)
+            # d(a^b) = a^b * (db*ln(a) + b*da/a)
+            return _mul(node, _add(_mul(db, _call('ln', a)), _div(_mul(b, da), a)))
+        return None
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) \
+            and node.func.id in _CHAIN_RULES and len(node.args) == 1:
+        inner = differentiate(node.args[0], name)
+        if inner is None:
+            return None
+        return _mul(_CHAIN_RULES[node.func.id](node.args[0]), inner)
+    return None
+
+
+# ---------------------------------------------------------------------------
+
+def _as_column(values, size):
+    return np.broadcast_to(np.asarray(values, dtype=float), (size,))
+
+
+def fit_model(model, x, y, params=None, initial=None, registry=None,
+              max_iterations=DEFAULT_MAX_ITERATIONS, tolerance=DEFAULT_TOLERANCE, time_limit=None):
+    """
+    Fit ``model`` (an expression in x) to the data by least squares.
+
+    params: parameter names; inferred from the model's free names if omitted.
+    initial: starting values (name -> value) for nonlinear models.
+    time_limit: seconds after which a nonlinear fit stops, unconverged.
+    Raises ValueError if the model or data cannot be fitted.
+    """
+    registry = registry if registry is not None else FunctionRegistry()
+    namespace = array_namespace()
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    if x.shape != y.shape or x.ndim != 1:
+        raise ValueError("x and y must be 1-D arrays of the same length")
+    finite = np.isfinite(x) & np.isfinite(y)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+
+    source = expand_model(model)
+    node = parse_expression(source)
+    known = set(namespace) | set(registry.functions)
+    params = list(params) if params is not None else model_parameters(node, known)
+    if not params:
+        raise ValueError("The model has no parameters to fit")
+    if len(x) < len(params):
+        raise ValueError(f"At least {len(params)} data points are needed")
+    arguments = ('x', *params)
+
+    evaluate = registry.vectorize(compile_node(node, arguments, source), namespace)
+    derivatives = [differentiate(node, name) for name in params]
+    jacobian = [registry.vectorize(compile_node(d, arguments, f"d({source})/d{name}"), namespace)
+                if d is not None else None for d, name in zip(derivatives, params)]
+    linear = all(d is not None and not any(_depends(d, p) for p in params) for d in derivatives)
+
+    def model_values(x, values):
+        with np.errstate(all='ignore'):
+            return _as_column(evaluate(x, *values), len(x))
+
+    def jacobian_matrix(x, values, current):
+        # Column-major, so each column is written and read contiguously
+        J = np.empty((len(x), len(params)), order='F')
+        with np.errstate(all='ignore'):
+            for i, column in enumerate(jacobian):
+                if column is not None:
+                    J[:, i] = column(x, *values)
+                    continue
+                # Forward difference for columns without an analytic derivative
+                step = np.sqrt(np.finfo(float).eps) * max(abs(values[i]), 1.0)
+                shifted = list(values)
+                shifted[i] += step
+                J[:, i] = (model_values(x, shifted) - current) / step
+        # e.g. d(x^b)/db = x^b*ln(x) at x = 0, where the model itself is fine
+        J[~np.isfinite(J)] = 0.0
+        return J
+
+    if linear:
+        # y = f(x; 0) + J p exactly, so one least-squares solve is the answer
+        zeros = [0.0] * len(params)
+        offset = model_values(x, zeros)
+        values = _solve_linear(jacobian_matrix(x, zeros, offset), y - offset)
+        iterations, converged = 1, True
+    else:
+        initial = initial or {}
+        values = np.array([float(initial.get(name, DEFAULT_INITIAL)) for name in params])
+        deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        iterations, polish_iterations = 0, max_iterations
+        with np.errstate(all='ignore'):
+            # A warm start (e.g. refitting after a small change) is already close
+            if len(x) > SUBSAMPLE_SIZE and not all(name in initial for name in params):
+                stride = len(x) // SUBSAMPLE_SIZE
+                values, iterations, converged = _levenberg_marquardt(
+                    values, x[::stride], y[::stride], model_values, jacobian_matrix,
+                    max_iterations, tolerance, deadline)
+                if not converged:
+                    polish_iterations = UNCONVERGED_POLISH_ITERATIONS
+            values, used, converged = _levenberg_marquardt(
+                values, x, y, model_values, jacobian_matrix, polish_iterations, tolerance, deadline)
+        iterations += used
+
+    residual = y - model_values(x, values)
+    rss = float(residual @ residual)
+    if not np.isfinite(rss):
+        raise ValueError("The model could not be evaluated on this data")
+    spread = y - y.mean()
+    total = float(spread @ spread)
+    r_squared = 1.0 - rss / total if total > 0 else 1.0
+    return FitResult(model, dict(zip(params, map(float, values))), rss, r_squared,
+                     iterations, converged, linear,
+                     lambda points: model_values(np.asarray(points, dtype=float), values))
+
+
+def _solve_linear(J, target):
+    # Normal equations, equilibrated to unit-norm columns: after J^T J only
+    # p x p work remains.
+    A = J.T @ J
+    norms = np.sqrt(np.diag(A))
+    norms[norms == 0] = 1.0
+    scaled = A / np.outer(norms, norms)
+    if np.linalg.cond(scaled) > MAX_NORMAL_CONDITION:
+        solution, *_ = np.linalg.lstsq(J / norms, target, rcond=None)
+    else:
+        solution = np.linalg.solve(scaled, (J.T @ target) / norms)
+    return solution / norms
+
+
+def _levenberg_marquardt(values, x, y, model_values, jacobian_matrix, max_iterations, tolerance,
+                         deadline=None):
+    current = model_values(x, values)
+    residual = y - current
+    cost = residual @ residual
+    if not np.isfinite(cost):
+        raise ValueError("The model is undefined at the initial parameters")
+    damping = 1e-3
+    for iteration in range(1, max_iterations + 1):
+        J = jacobian_matrix(x, values, current)
+        # Only p x p systems are solved; the N-sized work is two matrix products
+        A = J.T @ J
+        g = J.T @ residual
+        diagonal = np.diag(A).copy()
+        diagonal[diagonal == 0] = 1.0
+        while True:
+            try:
+                step = np.linalg.solve(A + damping * np.diag(diagonal), g)
+            except np.linalg.LinAlgError:
+                step = None
+            if step is not None:
+                candidate = values + step
+                candidate_values = model_values(x, candidate)
+                candidate_residual = y - candidate_values
+                candidate_cost = candidate_residual @ candidate_residual
+                if np.isfinite(candidate_cost) and candidate_cost <= cost:
+                    break
+            damping *= 10
+            if damping > 1e16:
+                return values, iteration, False
+        improvement = cost - candidate_cost
+        values, current, residual, cost = candidate, candidate_values, candidate_residual, candidate_cost
+        damping = max(damping / 10, 1e-12)
+        if improvement <= tolerance * max(cost, 1e-300) \
+                or np.max(np.abs(step)) <= tolerance * (np.max(np.abs(values)) + tolerance):
+            return values, iteration, True
+        if deadline is not None and time.perf_counter() > deadline:
+            return values, iteration, False
+    return values, max_iterations, False
+
+
+def load_dataset(path):
+    """Read the first two numeric columns of a CSV/whitespace file, skipping a header line."""
+    delimiter = ',' if path.lower().endswith('.csv') else None
+    for skip in (0, 1):
+        try:
+            data = np.loadtxt(path, delimiter=delimiter, skiprows=skip, ndmin=2)
+            break
+        except ValueError:
+            continue
+    else:
+        raise ValueError(f"Could not read numeric data from {path}")
+    if data.shape[1] < 2:
+        raise ValueError("The dataset needs an x and a y column")
+    return data[:, 0], data[:, 1]
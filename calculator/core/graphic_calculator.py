@@ -1,9 +1,21 @@
 """
 Graphic calculator: plotting and equation solving.
 """
+import math
 from .base_calculator import CalculatorMode
+from .curve_fitting import fit_model
 
 class GraphicCalculator(CalculatorMode):
+    def namespace(self) -> dict:
+        # Scalar counterparts of the vectorized plotting names (radians, log = log10)
+        names = {k: getattr(math, k) for k in dir(math) if not k.startswith("_")}
+        names.update({'log': math.log10, 'ln': math.log, 'abs': abs})
+        return names
+
+    def fit(self, model: str, x, y, initial=None, time_limit=None):
+        """Least-squares fit of a model expression in x (see curve_fitting.fit_model)."""
+        return fit_model(model, x, y, initial=initial, registry=self.functions, time_limit=time_limit)
+
     def calculate(self, expression: str) -> float:
         # Placeholder for graphing/equation solving logic
         raise NotImplementedError("Graphing and equation solving not implemented yet.")
@@ -7,6 +7,6 @@ class NormalCalculator(CalculatorMode):
     def calculate(self, expression: str) -> float:
         # Basic eval for demo; production code should use a safe parser
         try:
-            return eval(expression, {"__builtins__": None}, {})
+            return eval(expression, {"__builtins__": None}, self.functions.callables())
         except Exception:
             raise ValueError("Invalid expression")
@@ -0,0 +1,211 @@
+"""
+Programmer calculator: integer arithmetic and bitwise operations in
+fixed widths (8-512 bits, optionally signed) or unbounded, with hex, decimal,
+octal and binary views.
+
+Power-of-two bases convert in linear time through format()/int(); decimal
+conversion of large values is divide-and-conquer over cached powers of ten,
+which also avoids Python's limit on int <-> str conversion length.
+"""
+import ast
+import re
+from functools import lru_cache
+from .base_calculator import CalculatorMode
+
+WIDTHS = (8, 16, 32, 64, 128, 256, 512)
+BASES = {'HEX': 16, 'DEC': 10, 'OCT': 8, 'BIN': 2}
+
+# Unbounded results are capped so a stray 2**10**9 cannot hang the UI
+MAX_UNBOUNDED_BITS = 1 << 20
+# Values up to this size go through the built-in str()/int() directly
+_DIRECT_DIGITS = 512
+
+_POWER_OF_TWO_FORMATS = {16: 'X', 8: 'o', 2: 'b'}
+_PREFIXES = {'0x': 16, '0o': 8, '0b': 2}
+_LITERAL_RE = re.compile(r"\b[0-9A-Za-z]+\b")
+_DIGITS = "0123456789ABCDEF"
+_LOG10_2 = 0.30102999566398120
+
+
+@lru_cache(maxsize=64)
+def _pow10(exponent):
+    return 10 ** exponent
+
+
+def _split_point(digits):
+    # Largest power of two below half the digit count, so the cached powers
+    # of ten are shared between all conversions.
+    return 1 << max(0, (digits // 2).bit_length() - 1)
+
+
+def to_base(value, base=10):
+    """Digits of an int in base 2, 8, 10 or 16 (upper case, '-' for negatives)."""
+    if value < 0:
+        return '-' + to_base(-value, base)
+    if base in _POWER_OF_TWO_FORMATS:
+        return format(value, _POWER_OF_TWO_FORMATS[base])
+    if base != 10:
+        raise ValueError(f"Unsupported base {base}")
+    return _to_decimal(value, 0)
+
+
+def _to_decimal(value, width):
+    digits = int(value.bit_length() * _LOG10_2) + 1
+    if digits <= _DIRECT_DIGITS:
+        text = str(value)
+        return text.zfill(width) if width else text
+    k = _split_point(digits)
+    high, low = divmod(value, _pow10(k))
+    return _to_decimal(high, width - k if width else 0) + _to_decimal(low, k)
+
+
+def from_base(text, base=10):
+    """Parse digits in base 2, 8, 10 or 16 (no sign, no prefix) into an int."""
+    if not text or any(_DIGITS.find(c) < 0 or _DIGITS.find(c) >= base for c in text.upper()):
+        raise ValueError(f"Invalid base-{base} number: {text}")
+    if base != 10:
+        return int(text, base)
+    return _from_decimal(text)
+
+
+def _from_decimal(text):
+    if len(text) <= _DIRECT_DIGITS:
+        return int(text)
+    k = _split_point(len(text))
+    return _from_decimal(text[:-k]) * _pow10(k) + _from_decimal(text[-k:])
+
+
+def group_digits(text, size=4):
+    """Group digits from the right, e.g. '101101' -> '10 1101'."""
+    sign = '-' if text.startswith('-') else ''
+    digits = text[len(sign):]
+    head = len(digits) % size
+    groups = ([digits[:head]] if head else []) + \
+        [digits[i:i + size] for i in range(head, len(digits), size)]
+    return sign + ' '.join(groups)
+
+
+@lru_cache(maxsize=128)
+def format_views(value, width=None, signed=False):
+    """
+    All base views of a value at once. In fixed widths, hex/octal/binary show
+    the two's-complement bit pattern and DEC the (signed) value.
+    Cached, since every keystroke redraws all views.
+    """
+    pattern = value & ((1 << width) - 1) if width else value
+    return {
+        'HEX': group_digits(to_base(pattern, 16)),
+        'DEC': group_digits(to_base(value, 10), 3),
+        'OCT': group_digits(to_base(pattern, 8), 3),
+        'BIN': group_digits(to_base(pattern, 2).zfill(width or 1)),
+        'UNSIGNED': to_base(pattern, 10) if width and signed else None,
+    }
+
+
+def bit_field(value, high, low, width=None):
+    """Bits high..low (inclusive) of the two's-complement pattern of value."""
+    if low < 0 or high < low:
+        raise ValueError("Bit range must be high:low with high >= low >= 0")
+    if width and high >= width:
+        raise ValueError(f"Bit {high} is outside a {width}-bit value")
+    return (value >> low) & ((1 << (high - low + 1)) - 1)
+
+
+class ProgrammerCalculator(CalculatorMode):
+    def __init__(self, width=64, signed=True, input_base=10):
+        super().__init__()
+        self.width = width  # None for unbounded integers
+        self.signed = signed
+        self.input_base = input_base
+
+    def wrap(self, value):
+        """Truncate to the current width and reinterpret the sign bit if signed."""
+        if not self.width:
+            if value.bit_length() > MAX_UNBOUNDED_BITS:
+                raise ValueError("Result is too large")
+            return value
+        value &= (1 << self.width) - 1
+        if self.signed and value >> (self.width - 1):
+            value -= 1 << self.width
+        return value
+
+    def parse_literal(self, token):
+        """
+        A literal in the input base, or in the base named by a 0x/0o/0b prefix.
+        In hex input 0b is not a prefix, since 0B12 or 0BAD are hex digits.
+        """
+        prefix = token[:2].lower()
+        if prefix in _PREFIXES and len(token) > 2 and (self.input_base != 16 or prefix != '0b'):
+            return from_base(token[2:], _PREFIXES[prefix])
+        return from_base(token, self.input_base)
+
+    def calculate(self, expression: str) -> int:
+        # Literals are parsed here (in the input base) and replaced by
+        # placeholders, so ast never sees digits it would misread or refuse.
+        literals = []
+
+        def substitute(match):
+            literals.append(self.parse_literal(match.group(0)))
+            return f"_{len(literals) - 1}"
+
+        try:
+            tree = ast.parse(_LITERAL_RE.sub(substitute, expression).strip(), mode='eval')
+        except SyntaxError:
+            raise ValueError("Invalid expression")
+        return self.wrap(self._evaluate(tree.body, literals))
+
+    def _evaluate(self, node, literals):
+        if isinstance(node, ast.Name) and node.id[1:].isdigit() and int(node.id[1:]) < len(literals):
+            return self.wrap(literals[int(node.id[1:])])
+        if isinstance(node, ast.UnaryOp):
+            operand = self._evaluate(node.operand, literals)
+            if isinstance(node.op, ast.Invert):
+                return self.wrap(~operand)
+            if isinstance(node.op, ast.USub):
+                return self.wrap(-operand)
+            if isinstance(node.op, ast.UAdd):
+                return operand
+        if isinstance(node, ast.BinOp):
+            a = self._evaluate(node.left, literals)
+            b = self._evaluate(node.right, literals)
+            return self.wrap(self._binary(node.op, a, b))
+        raise ValueError("Invalid expression")
+
+    def _binary(self, op, a, b):
+        if isinstance(op, ast.Add):
+            return a + b
+        if isinstance(op, ast.Sub):
+            return a - b
+        if isinstance(op, ast.Mult):
+            return a * b
+        if isinstance(op, (ast.Div, ast.FloorDiv)):
+            # Integer division truncates toward zero, as in C
+            quotient = abs(a) // abs(b)
+            return -quotient if (a < 0) != (b < 0) else quotient
+        if isinstance(op, ast.Mod):
+            return a - b * self._binary(ast.FloorDiv(), a, b)
+        if isinstance(op, ast.Pow):
+            if b < 0:
+                raise ValueError("Negative exponent")
+            if self.width:
+                return pow(a, b, 1 << self.width)
+            if a not in (-1, 0, 1) and b * (abs(a).bit_length() - 1) > MAX_UNBOUNDED_BITS:
+                raise ValueError("Result is too large")
+            return a ** b
+        if isinstance(op, (ast.LShift, ast.RShift)):
+            if b < 0:
+                raise ValueError("Negative shift count")
+            if isinstance(op, ast.RShift):
+                return a >> b
+            if self.width:
+                return a << min(b, self.width)
+            if b > MAX_UNBOUNDED_BITS:
+                raise ValueError("Result is too large")
+            return a << b
+        if isinstance(op, ast.BitAnd):
+            return a & b
+        if isinstance(op, ast.BitOr):
+            return a | b
+        if isinstance(op, ast.BitXor):
+            return a ^ b
+        raise ValueError("Invalid expression")
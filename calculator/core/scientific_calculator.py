@@ -5,9 +5,12 @@ import math
 from .base_calculator import CalculatorMode
 
 class ScientificCalculator(CalculatorMode):
+    def namespace(self) -> dict:
+        return {k: getattr(math, k) for k in dir(math) if not k.startswith("_")}
+
     def calculate(self, expression: str) -> float:
-        # Allow math functions in eval
-        allowed_names = {k: getattr(math, k) for k in dir(math) if not k.startswith("_")}
+        # Allow math functions and user-defined functions in eval
+        allowed_names = {**self.namespace(), **self.functions.callables()}
         try:
             return eval(expression, {"__builtins__": None}, allowed_names)
         except Exception:
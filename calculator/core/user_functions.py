@@ -0,0 +1,564 @@
+"""
+User-defined functions: definitions such as ``f(n) = f(n-1) + f(n-2)`` or
+``g(x, y) = sqrt(x^2+y^2)`` are compiled once into a flat instruction list
+and evaluated with an explicit frame stack, so deep recursion never touches
+Python's recursion limit. Results are memoized in bounded LRU caches.
+
+Base cases are written as definitions with literal arguments, e.g.
+``f(0) = 0`` and ``f(1) = 1``, and ``if(cond, a, b)`` only evaluates the
+branch that is taken.
+"""
+import ast
+import math
+import operator
+import re
+from collections import OrderedDict
+
+# Opcodes. Every instruction is an ``(op, a, b)`` triple of ints, so a
+# program can be stored as a flat integer array.
+CONST, PARAM, NAME, UNARY, BINARY, COMPARE, CALL, JUMP, JUMP_IF_FALSE, RETURN = range(10)
+
+BINARY_OPS = [operator.add, operator.sub, operator.mul, operator.truediv,
+              operator.pow, operator.mod, operator.floordiv]
+UNARY_OPS = [operator.neg, operator.pos]
+COMPARE_OPS = [operator.lt, operator.le, operator.gt, operator.ge,
+               operator.eq, operator.ne]
+
+_BINARY_NODES = {ast.Add: 0, ast.Sub: 1, ast.Mult: 2, ast.Div: 3,
+                 ast.Pow: 4, ast.Mod: 5, ast.FloorDiv: 6}
+_UNARY_NODES = {ast.USub: 0, ast.UAdd: 1}
+_COMPARE_NODES = {ast.Lt: 0, ast.LtE: 1, ast.Gt: 2, ast.GtE: 3,
+                  ast.Eq: 4, ast.NotEq: 5}
+
+_DEFINITION_RE = re.compile(r"^\s*([A-Za-z_]\w*)\s*\(([^()]*)\)\s*=(?!=)(.*)$")
+_IDENTIFIER_RE = re.compile(r"^[A-Za-z_]\w*$")
+_IF_RE = re.compile(r"\bif\s*\(")
+_IF_NAME = "_if"
+
+DEFAULT_CACHE_SIZE = 4096
+DEFAULT_MAX_DEPTH = 100000
+# Plots and fits evaluate recursive functions point by point. A point that
+# never reaches a base case (e.g. f(2.5) for a recursion over integers) then
+# fails after this many nested calls, about a millisecond, instead of walking
+# the full DEFAULT_MAX_DEPTH.
+ARRAY_MAX_DEPTH = 200
+
+_MISSING = object()
+
+# math functions whose NumPy ufunc has another name, or the same one
+_NUMPY_RENAMED = {'asin': 'arcsin', 'acos': 'arccos', 'atan': 'arctan', 'atan2': 'arctan2',
+                  'asinh': 'arcsinh', 'acosh': 'arccosh', 'atanh': 'arctanh',
+                  'pow': 'float_power'}
+_NUMPY_SAME = {'sin', 'cos', 'tan', 'sinh', 'cosh', 'tanh', 'sqrt', 'cbrt', 'exp', 'exp2',
+               'expm1', 'log1p', 'log2', 'log10', 'hypot', 'degrees', 'radians', 'copysign',
+               'fmod', 'fabs', 'floor', 'ceil', 'trunc', 'isfinite', 'isinf', 'isnan',
+               'nextafter'}
+
+
+def _preprocess(text):
+    # Calculator syntax: ^ is power and if(...) is a lazy conditional
+    return _IF_RE.sub(_IF_NAME + "(", text.replace('^', '**'))
+
+
+class Program:
+    """A compiled expression: instructions, constants and referenced names."""
+
+    def __init__(self, source, params, code, consts, names):
+        self.source = source
+        self.params = tuple(params)
+        self.code = code
+        self.consts = consts
+        self.names = names
+
+    @property
+    def has_jumps(self):
+        return any(op in (JUMP, JUMP_IF_FALSE) for op, _, _ in self.code)
+
+    def called_names(self):
+        return {self.names[a] for op, a, _ in self.code if op == CALL}
+
+    def validate(self):
+        """
+        Check that the instructions are well formed, e.g. after loading them
+        from a file: operands in range, forward jumps only, and a stack that
+        never underflows and holds exactly one value at every RETURN.
+        Raises ValueError otherwise.
+        """
+        if not all(_IDENTIFIER_RE.match(p) for p in self.params) \
+                or len(set(self.params)) != len(self.params):
+            raise ValueError(f"Invalid parameters in program: {self.source}")
+        limits = {CONST: len(self.consts), PARAM: len(self.params), NAME: len(self.names),
+                  CALL: len(self.names), UNARY: len(UNARY_OPS), BINARY: len(BINARY_OPS),
+                  COMPARE: len(COMPARE_OPS), JUMP: len(self.code),
+                  JUMP_IF_FALSE: len(self.code), RETURN: 1}
+        # Stack depth on entry to each instruction, propagated along both
+        # edges of every jump; forward jumps keep this a single pass.
+        depths = {0: 0}
+        for pc, instruction in enumerate(self.code):
+            if len(instruction) != 3 or instruction[0] not in limits:
+                raise ValueError(f"Invalid instruction at {pc} in program: {self.source}")
+            op, a, b = instruction
+            if not 0 <= a < limits[op] or (op == JUMP or op == JUMP_IF_FALSE) and a <= pc:
+                raise ValueError(f"Invalid operand at {pc} in program: {self.source}")
+            if pc not in depths:
+                continue  # Unreachable
+            depth = depths[pc]
+            pops, pushes = {UNARY: (1, 1), BINARY: (2, 1), COMPARE: (2, 1), CALL: (b, 1),
+                            JUMP: (0, 0), JUMP_IF_FALSE: (1, 0), RETURN: (1, 0)}.get(op, (0, 1))
+            if b < 0 or depth < pops or op == RETURN and depth != 1:
+                raise ValueError(f"Invalid stack use at {pc} in program: {self.source}")
+            depth += pushes - pops
+            targets = [] if op == RETURN else [a] if op == JUMP else \
+                [a, pc + 1] if op == JUMP_IF_FALSE else [pc + 1]
+            for target in targets:
+                if target >= len(self.code) or depths.setdefault(target, depth) != depth:
+                    raise ValueError(f"Invalid control flow at {pc} in program: {self.source}")
+
+
+def parse_expression(text):
+    """Parse calculator syntax into a Python expression AST node."""
+    try:
+        return ast.parse(_preprocess(text).strip(), mode='eval').body
+    except SyntaxError:
+        raise ValueError(f"Invalid expression: {text}")
+
+
+def compile_expression(text, params=()):
+    """Compile an expression over the given parameter names into a Program."""
+    return compile_node(parse_expression(text), params, text)
+
+
+def compile_node(node, params=(), source=""):
+    """Compile an expression AST node (see parse_expression) into a Program."""
+    code, consts, names = [], [], []
+    params = tuple(params)
+
+    def index(table, value):
+        if value not in table:
+            table.append(value)
+        return table.index(value)
+
+    def emit(node):
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) \
+                and not isinstance(node.value, bool):
+            code.append((CONST, len(consts), 0))
+            consts.append(node.value)
+        elif isinstance(node, ast.Name):
+            if node.id in params:
+                code.append((PARAM, params.index(node.id), 0))
+            else:
+                code.append((NAME, index(names, node.id), 0))
+        elif isinstance(node, ast.BinOp) and type(node.op) in _BINARY_NODES:
+            emit(node.left)
+            emit(node.right)
+            code.append((BINARY, _BINARY_NODES[type(node.op)], 0))
+        elif isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_NODES:
+            emit(node.operand)
+            code.append((UNARY, _UNARY_NODES[type(node.op)], 0))
+        elif isinstance(node, ast.Compare) and len(node.ops) == 1 \
+                and type(node.ops[0]) in _COMPARE_NODES:
+            emit(node.left)
+            emit(node.comparators[0])
+            code.append((COMPARE, _COMPARE_NODES[type(node.ops[0])], 0))
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            if node.func.id == _IF_NAME:
+                if len(node.args) != 3:
+                    raise ValueError("if() takes exactly 3 arguments")
+                emit(node.args[0])
+                branch = len(code)
+                code.append(None)
+                emit(node.args[1])
+                skip = len(code)
+                code.append(None)
+                code[branch] = (JUMP_IF_FALSE, len(code), 0)
+                emit(node.args[2])
+                code[skip] = (JUMP, len(code), 0)
+            else:
+                for arg in node.args:
+                    emit(arg)
+                code.append((CALL, index(names, node.func.id), len(node.args)))
+        else:
+            raise ValueError(f"Unsupported syntax in expression: {source}")
+
+    emit(node)
+    code.append((RETURN, 0, 0))
+    return Program(source, params, code, consts, names)
+
+
+def parse_definition(text):
+    """
+    Split ``name(args) = body`` into ``(name, args, body)``.
+    Returns None if the text is not a function definition.
+    """
+    match = _DEFINITION_RE.match(text)
+    if not match:
+        return None
+    name, args, body = match.groups()
+    args = tuple(a.strip() for a in args.split(',')) if args.strip() else ()
+    return name, args, body.strip()
+
+
+class UserFunction:
+    def __init__(self, name, maxsize=DEFAULT_CACHE_SIZE):
+        self.name = name
+        self.program = None
+        self.cases = {}
+        self.maxsize = maxsize
+        self.cache = OrderedDict()
+        self.array_safe = False
+
+    @property
+    def params(self):
+        return self.program.params if self.program else ()
+
+    def lookup(self, args):
+        value = self.cases.get(args, _MISSING)
+        if value is not _MISSING:
+            return value
+        value = self.cache.get(args, _MISSING)
+        if value is not _MISSING:
+            self.cache.move_to_end(args)
+        return value
+
+    def store(self, args, value):
+        if self.maxsize <= 0:
+            return
+        self.cache[args] = value
+        if len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
+
+
+class _Frame:
+    __slots__ = ('function', 'args', 'pc', 'stack')
+
+    def __init__(self, function, args):
+        self.function = function
+        self.args = args
+        self.pc = 0
+        self.stack = []
+
+
+class FunctionRegistry:
+    """
+    Holds the user-defined functions of one calculator engine and evaluates
+    them against a namespace of built-in names (math functions, constants).
+    """
+
+    def __init__(self, namespace=None, maxsize=DEFAULT_CACHE_SIZE, max_depth=DEFAULT_MAX_DEPTH):
+        self.functions = {}
+        self.maxsize = maxsize
+        self.max_depth = max_depth
+        self._namespace = dict(namespace or {})
+
+    @property
+    def namespace(self):
+        return self._namespace
+
+    @namespace.setter
+    def namespace(self, namespace):
+        # Cached results may depend on the old built-ins (e.g. angle mode)
+        self._namespace = dict(namespace)
+        self.invalidate()
+
+    def invalidate(self):
+        for function in self.functions.values():
+            function.cache.clear()
+
+    def __contains__(self, name):
+        return name in self.functions
+
+    def define(self, text):
+        """Compile and register a definition. Returns the function name."""
+        parsed = parse_definition(text)
+        if parsed is None:
+            raise ValueError(f"Not a function definition: {text}")
+        name, args, body = parsed
+        if name == _IF_NAME or name == 'if':
+            raise ValueError("'if' cannot be redefined")
+        function = self.functions.get(name) or UserFunction(name, self.maxsize)
+
+        if all(_IDENTIFIER_RE.match(a) for a in args):
+            if len(set(args)) != len(args):
+                raise ValueError(f"Duplicate parameter in definition of {name}")
+            if function.cases and len(args) != len(next(iter(function.cases))):
+                function.cases.clear()
+            function.program = compile_expression(body, args)
+        else:
+            try:
+                key = tuple(ast.literal_eval(a) for a in args)
+            except (ValueError, SyntaxError):
+                raise ValueError(f"Invalid parameters in definition of {name}")
+            self.set_case(name, key, self.evaluate(compile_expression(body)))
+            return name
+
+        self.functions[name] = function
+        self._analyse()
+        self.invalidate()
+        return name
+
+    def set_case(self, name, args, value):
+        """Install the base case ``name(*args) = value``, e.g. one restored from a session."""
+        if not all(isinstance(v, (int, float)) for v in (*args, value)):
+            raise ValueError(f"Base cases of {name} must have real arguments and values")
+        function = self.functions.get(name) or UserFunction(name, self.maxsize)
+        if function.program and len(args) != len(function.params):
+            raise ValueError(f"{name} takes {len(function.params)} argument(s)")
+        function.cases[tuple(args)] = value
+        self.functions[name] = function
+        self._analyse()
+        self.invalidate()
+
+    def register(self, name, program):
+        """Install an already compiled Program (e.g. restored from a session) as a function."""
+        function = self.functions.get(name) or UserFunction(name, self.maxsize)
+        function.program = program
+        self.functions[name] = function
+        self._analyse()
+        self.invalidate()
+
+    def _analyse(self):
+        # Array safety depends on every function a body can reach, so it is
+        # recomputed as a fixed point after each (re)definition.
+        for function in self.functions.values():
+            program = function.program
+            function.array_safe = bool(program) and not program.has_jumps and not function.cases
+        changed = True
+        while changed:
+            changed = False
+            for function in self.functions.values():
+                if not function.program:
+                    continue
+                callees = [self.functions[n] for n in function.program.called_names()
+                           if n in self.functions]
+                safe = function.array_safe and all(c.array_safe for c in callees) \
+                    and function not in callees
+                if safe != function.array_safe:
+                    function.array_safe = safe
+                    changed = True
+        # Any cycle through array-safe functions would recurse without end
+        for function in self.functions.values():
+            if function.array_safe and self._reaches(function, function):
+                function.array_safe = False
+
+    def _reaches(self, start, target):
+        seen, pending = set(), [start]
+        while pending:
+            function = pending.pop()
+            for name in function.program.called_names() if function.program else ():
+                callee = self.functions.get(name)
+                if callee is target:
+                    return True
+                if callee is not None and callee.name not in seen:
+                    seen.add(callee.name)
+                    pending.append(callee)
+        return False
+
+    def _call_builtin(self, name, args):
+        target = self._namespace.get(name)
+        if not callable(target):
+            raise ValueError(f"Unknown function: {name}")
+        try:
+            return target(*args)
+        except TypeError:
+            raise ValueError(f"Invalid arguments for {name}")
+
+    def _load_name(self, name):
+        if name not in self._namespace:
+            raise ValueError(f"Unknown name: {name}")
+        return self._namespace[name]
+
+    def call(self, name, args):
+        """Call a user-defined function with a tuple of scalar arguments."""
+        function = self.functions.get(name)
+        if function is None:
+            raise ValueError(f"Unknown function: {name}")
+        return self._run(function, tuple(args))
+
+    def evaluate(self, program, args=()):
+        """Evaluate a stand-alone Program (one not registered as a function)."""
+        function = UserFunction('<expression>', maxsize=0)
+        function.program = program
+        return self._run(function, tuple(args))
+
+    def _run(self, function, args, max_depth=None):
+        max_depth = max_depth or self.max_depth
+        value = self._enter(function, args)
+        if value is not _MISSING:
+            return value
+        frames = [_Frame(function, args)]
+        functions = self.functions
+        while True:
+            frame = frames[-1]
+            program = frame.function.program
+            code, consts, names = program.code, program.consts, program.names
+            stack, params = frame.stack, frame.args
+            pc = frame.pc
+            while True:
+                op, a, b = code[pc]
+                pc += 1
+                if op == CONST:
+                    stack.append(consts[a])
+                elif op == PARAM:
+                    stack.append(params[a])
+                elif op == BINARY:
+                    right = stack.pop()
+                    stack[-1] = BINARY_OPS[a](stack[-1], right)
+                elif op == CALL:
+                    call_args = tuple(stack[len(stack) - b:])
+                    del stack[len(stack) - b:]
+                    callee = functions.get(names[a])
+                    if callee is None:
+                        stack.append(self._call_builtin(names[a], call_args))
+                        continue
+                    value = self._enter(callee, call_args)
+                    if value is not _MISSING:
+                        stack.append(value)
+                        continue
+                    if len(frames) >= max_depth:
+                        raise ValueError(f"Recursion too deep in {callee.name}")
+                    frame.pc = pc
+                    frames.append(_Frame(callee, call_args))
+                    break
+                elif op == RETURN:
+                    value = stack.pop()
+                    frame.function.store(frame.args, value)
+                    frames.pop()
+                    if not frames:
+                        return value
+                    frames[-1].stack.append(value)
+                    break
+                elif op == NAME:
+                    stack.append(self._load_name(names[a]))
+                elif op == UNARY:
+                    stack[-1] = UNARY_OPS[a](stack[-1])
+                elif op == COMPARE:
+                    right = stack.pop()
+                    stack[-1] = COMPARE_OPS[a](stack[-1], right)
+                elif op == JUMP:
+                    pc = a
+                elif op == JUMP_IF_FALSE:
+                    if not stack.pop():
+                        pc = a
+
+    def _enter(self, function, args):
+        value = function.lookup(args)
+        if value is not _MISSING:
+            return value
+        if function.program is None:
+            raise ValueError(f"{function.name}{args} is not defined")
+        if len(args) != len(function.params):
+            raise ValueError(f"{function.name} takes {len(function.params)} argument(s)")
+        return _MISSING
+
+    def callables(self):
+        """Plain Python callables for every user function, for use in eval()."""
+        return {name: (lambda *args, _name=name: self.call(_name, args))
+                for name in self.functions}
+
+    def vectorize(self, name_or_program, namespace=None):
+        """
+        Return a callable over NumPy arrays. Straight-line definitions run the
+        compiled program once over whole arrays; recursive or conditional ones
+        fall back to the (memoized) scalar evaluator element by element, with
+        NaN wherever the evaluation fails or recurses deeper than
+        ARRAY_MAX_DEPTH.
+        """
+        import numpy as np
+        namespace = array_namespace() if namespace is None else namespace
+        if isinstance(name_or_program, Program):
+            function = UserFunction('<expression>', maxsize=0)
+            function.program = name_or_program
+            function.array_safe = not name_or_program.has_jumps and all(
+                self.functions[n].array_safe
+                for n in name_or_program.called_names() if n in self.functions)
+        else:
+            function = self.functions.get(name_or_program)
+            if function is None or function.program is None:
+                raise ValueError(f"Unknown function: {name_or_program}")
+
+        if function.array_safe:
+            return lambda *arrays: np.asarray(
+                self._run_array(function.program, arrays, namespace), dtype=float)
+
+        def element(*args):
+            # Undefined points become NaN, as they do on the array path
+            try:
+                return self._run(function, args, min(self.max_depth, ARRAY_MAX_DEPTH))
+            except (ValueError, ArithmeticError):
+                return math.nan
+
+        scalar = np.frompyfunc(element, len(function.params), 1)
+        return lambda *arrays: np.asarray(scalar(*arrays), dtype=float)
+
+    def _run_array(self, program, args, namespace):
+        # Array-safe programs have no jumps and only call array-safe
+        # functions, so plain recursion here is bounded by definition nesting.
+        stack = []
+        names = program.names
+        for op, a, b in program.code:
+            if op == CONST:
+                stack.append(program.consts[a])
+            elif op == PARAM:
+                stack.append(args[a])
+            elif op == NAME:
+                if names[a] not in namespace:
+                    raise ValueError(f"Unknown name: {names[a]}")
+                stack.append(namespace[names[a]])
+            elif op == UNARY:
+                stack[-1] = UNARY_OPS[a](stack[-1])
+            elif op in (BINARY, COMPARE):
+                right = stack.pop()
+                table = BINARY_OPS if op == BINARY else COMPARE_OPS
+                stack[-1] = table[a](stack[-1], right)
+            elif op == CALL:
+                call_args = tuple(stack[len(stack) - b:])
+                del stack[len(stack) - b:]
+                callee = self.functions.get(names[a])
+                if callee is not None:
+                    if len(call_args) != len(callee.params):
+                        raise ValueError(f"{callee.name} takes {len(callee.params)} argument(s)")
+                    stack.append(self._run_array(callee.program, call_args, namespace))
+                elif callable(namespace.get(names[a])):
+                    try:
+                        stack.append(namespace[names[a]](*call_args))
+                    except TypeError:
+                        raise ValueError(f"Invalid arguments for {names[a]}")
+                else:
+                    raise ValueError(f"Unknown function: {names[a]}")
+            elif op == RETURN:
+                return stack.pop()
+
+
+def _elementwise(function):
+    # Scalar math functions without a NumPy ufunc, applied point by point
+    import numpy as np
+
+    def element(*args):
+        try:
+            return function(*args)
+        except (ValueError, ArithmeticError):
+            return math.nan
+
+    return np.vectorize(element, otypes=[float])
+
+
+def array_namespace():
+    """
+    NumPy equivalents of every name in ``math`` (radians, log = log10), so
+    the array path accepts the same expressions as the scalar evaluator.
+    Functions without a ufunc are vectorized, with NaN where they fail.
+    """
+    import numpy as np
+    names = {}
+    for name in dir(math):
+        if name.startswith('_'):
+            continue
+        value = getattr(math, name)
+        if name in _NUMPY_RENAMED:
+            names[name] = getattr(np, _NUMPY_RENAMED[name])
+        elif name in _NUMPY_SAME:
+            names[name] = getattr(np, name)
+        else:
+            names[name] = _elementwise(value) if callable(value) else value
+    names.update({'log': np.log10, 'ln': np.log, 'abs': np.abs})
+    return names
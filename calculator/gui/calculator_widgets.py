@@ -2,12 +2,21 @@
 Calculator widgets: buttons, display, input handling.
 """
 from PyQt5.QtWidgets import (
-    QWidget, QVBoxLayout, QGridLayout, QPushButton, QLineEdit, QLabel, QSizePolicy, QHBoxLayout, QButtonGroup, QRadioButton, QListWidget, QScrollArea
+    QWidget, QVBoxLayout, QGridLayout, QPushButton, QLineEdit, QLabel, QSizePolicy, QHBoxLayout, QButtonGroup, QRadioButton, QListWidget, QScrollArea,
+    QFileDialog, QComboBox, QCheckBox, QPlainTextEdit
 )
 from PyQt5.QtCore import Qt, pyqtSignal
 from core.normal_calculator import NormalCalculator
 from core.scientific_calculator import ScientificCalculator
+from core.graphic_calculator import GraphicCalculator
+from core.programmer_calculator import ProgrammerCalculator, WIDTHS, BASES, to_base, format_views, bit_field
+from core.curve_fitting import load_dataset
+from core.user_functions import parse_definition
+from utils.plot_utils import DEFAULT_RANGE, DEFAULT_SAMPLES
+import numpy as np
+from .plot_widget import PlotWidget
 import math
+import re
 
 class CalculatorWidget(QWidget):
     expression_evaluated = pyqtSignal(str, str)  # Signal for history (expression, result)
@@ -31,6 +40,7 @@ class CalculatorWidget(QWidget):
             ]
         elif self.mode_name == "Scientific":
             self.calculator = ScientificCalculator()
+            self.calculator.functions.namespace = self.scientific_names()
             self.buttons = [
                 ['Rad', 'Deg', 'x!', '(', ')', '%', 'AC'],
                 ['Inv', 'sin', 'ln', '7', '8', '9', '/'],
@@ -166,15 +176,7 @@ class CalculatorWidget(QWidget):
             }
         }
 
-        button_type = "default"
-        if text in {'+', '-', '*', '/', '=', '%', 'x^', '√', 'EXP'}:
-            button_type = "operator"
-        elif text in {'sin', 'cos', 'tan', 'ln', 'log', 'π', 'e', 'x!', '(', ')', 'Inv', 'Ans'}:
-            button_type = "scientific"
-        elif text in {'AC', 'C'}:
-            button_type = "clear"
-        elif text in {'Rad', 'Deg'}:
-            button_type = "angle"
+        button_type = self.button_type(text)
 
         current_style_key = "pressed" if pressed else "normal"
         if button_type == "angle":
@@ -184,9 +186,23 @@ class CalculatorWidget(QWidget):
         style = style_config[button_type][current_style_key]
         return f"{style} {base_style}"
 
+    def button_type(self, text):
+        if text in {'+', '-', '*', '/', '=', '%', 'x^', '√', 'EXP'}:
+            return "operator"
+        elif text in {'sin', 'cos', 'tan', 'ln', 'log', 'π', 'e', 'x!', '(', ')', 'Inv', 'Ans'}:
+            return "scientific"
+        elif text in {'AC', 'C'}:
+            return "clear"
+        elif text in {'Rad', 'Deg'}:
+            return "angle"
+        return "default"
+
     def set_angle_mode_button(self, mode):
         self.angle_mode = mode.upper()
         self.update_angle_mode_buttons()
+        if self.calculator is not None:
+            # Memoized results of user functions depend on the angle mode
+            self.calculator.functions.invalidate()
 
     def update_angle_mode_buttons(self):
         for mode, btn in self.angle_buttons.items():
@@ -197,8 +213,12 @@ class CalculatorWidget(QWidget):
             self.display.clear()
         elif text == '=':
             expr = self.display.text()
+            if parse_definition(expr):
+                self.define_function(expr)
+                return
             try:
-                expr = expr.replace('x^', '**').replace('√', 'sqrt').replace('π', str(math.pi)).replace('e', str(math.e))
+                expr = expr.replace('x^', '**').replace('√', 'sqrt').replace('π', str(math.pi))
+                expr = re.sub(r'\be\b', str(math.e), expr)
                 if self.mode_name == "Scientific":
                     result = self.eval_scientific(expr)
                 else:
@@ -247,9 +267,24 @@ class CalculatorWidget(QWidget):
         else:
             self.display.setText(self.display.text() + text)
 
+    def define_function(self, definition):
+        try:
+            name = self.calculator.define(definition.replace('√', 'sqrt').replace('π', str(math.pi)))
+        except ValueError:
+            self.display.setText("Definition Error")
+            return
+        self.display.clear()
+        self.expression_evaluated.emit(definition, f"{name} defined")
+
     def eval_scientific(self, expr):
+        allowed = self.scientific_names()
+        allowed.update(self.calculator.functions.callables())
+        allowed['__builtins__'] = None
+        return eval(expr, allowed)
+
+    def scientific_names(self):
         # Add support for deg/rad for trig functions
-        allowed = {
+        return {
             'sin': lambda x: math.sin(math.radians(x)) if self.angle_mode == 'DEG' else math.sin(x),
             'cos': lambda x: math.cos(math.radians(x)) if self.angle_mode == 'DEG' else math.cos(x),
             'tan': lambda x: math.tan(math.radians(x)) if self.angle_mode == 'DEG' else math.tan(x),
@@ -258,9 +293,7 @@ class CalculatorWidget(QWidget):
             'ln': math.log,
             'pi': math.pi,
             'e': math.e,
-            '__builtins__': None
         }
-        return eval(expr, allowed)
 
     def keyPressEvent(self, event):
         key = event.key()
@@ -286,7 +319,7 @@ class CalculatorWidget(QWidget):
     def resizeEvent(self, event):
         super().resizeEvent(event)
         # Update display font size
-        w, h = self.width(), self.height()
+        h = self.height()
         display_font_size = min(max(24, h // 15), 36)
         self.display.setStyleSheet(f"""
             QLineEdit {{
@@ -299,7 +332,10 @@ class CalculatorWidget(QWidget):
                 border: 1px solid #444;
             }}
         """)
+        self.resize_buttons()
 
+    def resize_buttons(self):
+        w, h = self.width(), self.height()
         # Calculate button dimensions based on available space
         if self.button_group:
             # Get grid dimensions
@@ -310,11 +346,11 @@ class CalculatorWidget(QWidget):
             spacing = self.grid.spacing()
             margins = self.grid.contentsMargins()
             available_w = w - margins.left() - margins.right() - (spacing * (cols - 1))
-            available_h = h - self.display.height() - margins.top() - margins.bottom() - (spacing * (rows - 1))
+            available_h = h - self.reserved_height() - margins.top() - margins.bottom() - (spacing * (rows - 1))
             
             # Calculate button dimensions
-            btn_w = available_w // cols
-            btn_h = available_h // rows
+            btn_w = max(0, available_w // cols)
+            btn_h = max(0, available_h // rows)
             
             # Apply size to buttons
             for btn in self.button_group.buttons():
@@ -332,16 +368,383 @@ class CalculatorWidget(QWidget):
                                                   selected=is_selected,
                                                   font_size=font_size))
 
+    def reserved_height(self):
+        """Height taken by everything above the button grid."""
+        return self.display.height()
+
+class ProgrammerCalculatorWidget(CalculatorWidget):
+    OPTION_STYLE = "font-size: 13px; color: #fff; background: #333; border: 1px solid #444; border-radius: 4px; padding: 4px;"
+    VIEW_STYLE = """
+        QPlainTextEdit {
+            font-family: monospace;
+            font-size: 13px;
+            background: #222;
+            color: #fff;
+            border: 1px solid #444;
+            border-radius: 4px;
+        }
+    """
+    LABEL_STYLE = "font-size: 13px; color: #ff9500; border: none;"
+    # Views are one line and grow to this many as the value gets longer, then scroll
+    MAX_VIEW_LINES = 2
+    MIN_BUTTON_HEIGHT = 32
+
+    def __init__(self):
+        self.value = None  # last successfully evaluated value
+        super().__init__("Programmer")
+
+    def init_calculator(self):
+        self.calculator = ProgrammerCalculator()
+        self.buttons = [
+            ['AC', '(', ')', '<<', '>>', '/'],
+            ['A', 'B', '7', '8', '9', '*'],
+            ['C', 'D', '4', '5', '6', '-'],
+            ['E', 'F', '1', '2', '3', '+'],
+            ['~', '&', '|', '^', '0', '=']
+        ]
+
+    def init_ui(self):
+        super().init_ui()
+        layout = self.layout()
+
+        # Width, signedness and the base bare literals are typed in
+        options = QHBoxLayout()
+        self.width_selector = QComboBox()
+        self.width_selector.addItems([f"{w}-bit" for w in WIDTHS] + ["Unbounded"])
+        self.width_selector.setCurrentText(f"{self.calculator.width}-bit")
+        self.signed_box = QCheckBox("Signed")
+        self.signed_box.setChecked(self.calculator.signed)
+        self.base_selector = QComboBox()
+        self.base_selector.addItems(list(BASES))
+        self.base_selector.setCurrentText("DEC")
+        for widget in (self.width_selector, self.signed_box, self.base_selector):
+            widget.setStyleSheet(self.OPTION_STYLE)
+            options.addWidget(widget)
+        self.width_selector.currentTextChanged.connect(self.update_options)
+        self.signed_box.toggled.connect(self.update_options)
+        self.base_selector.currentTextChanged.connect(self.change_input_base)
+
+        # All base views, refreshed together on every keystroke
+        views = QGridLayout()
+        views.setVerticalSpacing(4)
+        self.views_layout = views
+        self.views = {}
+        for row, name in enumerate(list(BASES) + ['UNSIGNED']):
+            label = QLabel(name)
+            label.setStyleSheet(self.LABEL_STYLE)
+            view = QPlainTextEdit()
+            view.setReadOnly(True)
+            view.setLineWrapMode(QPlainTextEdit.WidgetWidth)
+            view.setStyleSheet(self.VIEW_STYLE)
+            view.setFixedHeight(self.view_height(view, 1))
+            views.addWidget(label, row, 0)
+            views.addWidget(view, row, 1)
+            self.views[name] = view
+
+        # Bit-field inspection: "7:4" or a single bit "3"
+        field_layout = QHBoxLayout()
+        field_label = QLabel("Bits")
+        field_label.setStyleSheet(self.LABEL_STYLE)
+        self.field_input = QLineEdit()
+        self.field_input.setPlaceholderText("high:low")
+        self.field_input.setStyleSheet(self.OPTION_STYLE)
+        self.field_value = QLabel("")
+        self.field_value.setStyleSheet("font-size: 13px; color: #fff; border: none;")
+        self.field_value.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.field_input.textChanged.connect(self.update_bit_field)
+        field_layout.addWidget(field_label)
+        field_layout.addWidget(self.field_input)
+        field_layout.addWidget(self.field_value, 1)
+
+        layout.insertLayout(1, options)
+        layout.insertLayout(2, views)
+        layout.insertLayout(3, field_layout)
+        self.display.textChanged.connect(self.update_views)
+        self.update_views()
+
+    def reserved_height(self):
+        # Display, options row, base views and bit-field row, with the
+        # spacing between them and the grid
+        layout = self.layout()
+        margins = layout.contentsMargins()
+        rows = [layout.itemAt(i) for i in range(1, layout.indexOf(self.grid))]
+        return (super().reserved_height() + sum(row.sizeHint().height() for row in rows)
+                + layout.spacing() * (len(rows) + 1) + margins.top() + margins.bottom())
+
+    def minimum_height(self):
+        """Smallest height that keeps MIN_BUTTON_HEIGHT buttons with every view at full size."""
+        grown = sum(self.view_height(view, self.MAX_VIEW_LINES) - view.height()
+                    for view in self.views.values())
+        rows = len(self.buttons)
+        margins = self.grid.contentsMargins()
+        return (self.reserved_height() - self.display.height() + self.display.minimumHeight() + grown + rows * self.MIN_BUTTON_HEIGHT
+                + self.grid.spacing() * (rows - 1) + margins.top() + margins.bottom())
+
+    @staticmethod
+    def view_height(view, lines):
+        chrome = 2 * (view.frameWidth() + view.document().documentMargin())
+        return int(lines * view.fontMetrics().lineSpacing() + chrome)
+
+    def fit_views(self):
+        # Word-wrapped line count of each view's digit groups (monospace font).
+        # Returns whether any view changed height.
+        changed = False
+        for view in self.views.values():
+            metrics = view.fontMetrics()
+            width = view.viewport().width() - 2 * view.document().documentMargin()
+            per_line = max(1, int(width // metrics.horizontalAdvance('0')))
+            lines, used = 1, 0
+            for group in view.toPlainText().split():
+                if used and used + 1 + len(group) > per_line:
+                    lines, used = lines + 1, 0
+                used += (1 if used else 0) + len(group)
+                lines += (used - 1) // per_line
+                used = (used - 1) % per_line + 1
+            height = self.view_height(view, min(lines, self.MAX_VIEW_LINES))
+            if view.height() != height:
+                view.setFixedHeight(height)
+                changed = True
+        if changed:
+            self.views_layout.invalidate()
+        return changed
+
+    def resizeEvent(self, event):
+        self.fit_views()
+        super().resizeEvent(event)
+
+    def button_type(self, text):
+        if text in {'<<', '>>', '&', '|', '^', '~'}:
+            return "operator"
+        if text in {'A', 'B', 'C', 'D', 'E', 'F'}:
+            return "scientific"
+        return super().button_type(text)
+
+    def on_button_click(self, text):
+        # 'C' is a hex digit here, so only AC clears
+        if text == 'AC':
+            self.display.clear()
+        elif text == '=':
+            expr = self.display.text()
+            try:
+                result = self.calculator.calculate(expr)
+            except ZeroDivisionError:
+                self.display.setText("Division by Zero")
+                return
+            except ValueError:
+                self.display.setText("Error")
+                return
+            text = to_base(result, self.calculator.input_base)
+            self.display.setText(text)
+            self.expression_evaluated.emit(expr, text)
+        else:
+            self.display.setText(self.display.text() + text)
+
+    def keyPressEvent(self, event):
+        if event.key() in (Qt.Key_Enter, Qt.Key_Return, Qt.Key_Equal):
+            self.on_button_click('=')
+        elif event.key() == Qt.Key_Backspace:
+            self.on_button_click('AC')
+        else:
+            super().keyPressEvent(event)
+
+    def update_options(self):
+        width = self.width_selector.currentText()
+        self.calculator.width = None if width == "Unbounded" else int(width.split('-')[0])
+        self.calculator.signed = self.signed_box.isChecked()
+        self.update_views()
+
+    def set_options(self, width, signed, base):
+        self.width_selector.setCurrentText(f"{width}-bit" if width else "Unbounded")
+        self.signed_box.setChecked(signed)
+        self.base_selector.setCurrentText(base)
+
+    def change_input_base(self, base):
+        self.calculator.input_base = BASES[base]
+        # Re-enter the current value in the new base so the display stays valid
+        if self.value is not None:
+            self.display.setText(to_base(self.value, self.calculator.input_base))
+        else:
+            self.update_views()
+
+    def update_views(self):
+        text = self.display.text()
+        if not text.strip():
+            self.value = None
+        else:
+            try:
+                self.value = self.calculator.calculate(text)
+            except (ValueError, ZeroDivisionError):
+                return  # Incomplete input such as "5 +": keep the last views
+        if self.value is None:
+            for view in self.views.values():
+                view.clear()
+        else:
+            views = format_views(self.value, self.calculator.width, self.calculator.signed)
+            for name, view in self.views.items():
+                view.setPlainText(views[name] or "")
+        if self.fit_views():
+            self.resize_buttons()
+        self.update_bit_field()
+
+    def update_bit_field(self):
+        spec = self.field_input.text().strip()
+        if not spec or self.value is None:
+            self.field_value.clear()
+            return
+        try:
+            high, _, low = spec.partition(':')
+            high = int(high)
+            low = int(low) if low else high
+            field = bit_field(self.value, high, low, self.calculator.width)
+        except ValueError as e:
+            self.field_value.setText(str(e) if ':' in spec or spec.isdigit() else "")
+            return
+        self.field_value.setText(f"0x{to_base(field, 16)} = {to_base(field, 10)}")
+
 class GraphicCalculatorWidget(QWidget):
+    expression_evaluated = pyqtSignal(str, str)  # Signal for history (expression, result)
+    # Fits run on the GUI thread; an unconverged fit can be continued by fitting again
+    FIT_TIME_LIMIT = 2.0
+
+    INPUT_STYLE = """
+        QLineEdit {
+            font-size: 16px;
+            background: #222;
+            color: #fff;
+            border-radius: 6px;
+            padding: 6px 10px;
+            border: 1px solid #444;
+        }
+    """
+
+    BUTTON_STYLE = """
+        QPushButton {
+            background: #333;
+            color: #ff9500;
+            border-radius: 4px;
+            padding: 5px 10px;
+            font-size: 13px;
+            border: 1px solid #444;
+        }
+        QPushButton:hover {
+            background: #444;
+        }
+        QPushButton:pressed {
+            background: #222;
+        }
+    """
+
     def __init__(self):
         super().__init__()
+        self.mode_name = "Graphic"
+        self.calculator = GraphicCalculator()
         layout = QVBoxLayout()
-        label = QLabel("Graphing calculator coming soon!")
-        label.setAlignment(Qt.AlignCenter)
-        label.setStyleSheet("font-size: 18px; color: #888;")
-        layout.addWidget(label)
+        layout.setSpacing(10)
+        layout.setContentsMargins(10, 10, 10, 10)
+
+        # Expression input: "sin(x)", "y = x^2" or a definition such as "f(x) = x^3"
+        self.display = QLineEdit()
+        self.display.setPlaceholderText("y = sin(x)")
+        self.display.setStyleSheet(self.INPUT_STYLE)
+        self.display.returnPressed.connect(self.plot_expression)
+        layout.addWidget(self.display)
+
+        range_layout = QHBoxLayout()
+        self.x_min_input = QLineEdit(str(DEFAULT_RANGE[0]))
+        self.x_max_input = QLineEdit(str(DEFAULT_RANGE[1]))
+        for label_text, field in (("x min", self.x_min_input), ("x max", self.x_max_input)):
+            label = QLabel(label_text)
+            label.setStyleSheet("font-size: 13px; color: #888; border: none;")
+            field.setStyleSheet(self.INPUT_STYLE)
+            field.returnPressed.connect(self.plot_expression)
+            range_layout.addWidget(label)
+            range_layout.addWidget(field)
+        layout.addLayout(range_layout)
+
+        # Curve fitting: load an (x, y) dataset and fit a model such as "a*exp(b*x)" or "poly3"
+        fit_layout = QHBoxLayout()
+        self.load_btn = QPushButton("Load data")
+        self.model_input = QLineEdit()
+        self.model_input.setPlaceholderText("model: a*exp(b*x), poly3, ...")
+        self.model_input.returnPressed.connect(self.fit_model)
+        self.fit_btn = QPushButton("Fit")
+        for btn in (self.load_btn, self.fit_btn):
+            btn.setFixedHeight(32)
+            btn.setStyleSheet(self.BUTTON_STYLE)
+        self.model_input.setStyleSheet(self.INPUT_STYLE)
+        self.load_btn.clicked.connect(self.load_data)
+        self.fit_btn.clicked.connect(self.fit_model)
+        fit_layout.addWidget(self.load_btn)
+        fit_layout.addWidget(self.model_input)
+        fit_layout.addWidget(self.fit_btn)
+        layout.addLayout(fit_layout)
+        self.dataset = None
+        self.last_fit = None
+
+        self.status = QLabel("")
+        self.status.setStyleSheet("font-size: 13px; color: #ff3b30; border: none;")
+        layout.addWidget(self.status)
+
+        self.plot_widget = PlotWidget()
+        layout.addWidget(self.plot_widget, 1)
         self.setLayout(layout)
 
+    def plot_expression(self):
+        text = self.display.text().strip()
+        if not text:
+            return
+        self.status.clear()
+        try:
+            if parse_definition(text):
+                name = self.calculator.define(text)
+                self.expression_evaluated.emit(text, f"{name} defined")
+                return
+            expression = re.sub(r'^\s*y\s*=(?!=)', '', text).strip()
+            self.plot_widget.plot(expression, float(self.x_min_input.text()),
+                                  float(self.x_max_input.text()),
+                                  registry=self.calculator.functions)
+        except (ValueError, ArithmeticError) as e:
+            self.status.setText(str(e))
+
+    def load_data(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Load dataset", "",
+                                              "Data files (*.csv *.txt *.dat);;All files (*)")
+        if not path:
+            return
+        try:
+            self.dataset = load_dataset(path)
+        except (OSError, ValueError) as e:
+            self.status.setText(str(e))
+            return
+        self.last_fit = None
+        self.status.clear()
+        self.plot_widget.show_data(*self.dataset)
+
+    def fit_model(self):
+        model = self.model_input.text().strip()
+        if not model:
+            return
+        if self.dataset is None:
+            self.status.setText("Load a dataset first")
+            return
+        x, y = self.dataset
+        # Refitting the same model starts from the previous parameters
+        initial = self.last_fit.params if self.last_fit and self.last_fit.model == model else None
+        try:
+            result = self.calculator.fit(model, x, y, initial=initial, time_limit=self.FIT_TIME_LIMIT)
+        except (ValueError, ArithmeticError, np.linalg.LinAlgError) as e:
+            self.status.setText(str(e))
+            return
+        self.last_fit = result
+        if result.converged:
+            self.status.clear()
+        else:
+            self.status.setText(f"The fit did not converge after {result.iterations} iterations; "
+                                "try other initial values")
+        xs = np.linspace(np.min(x), np.max(x), DEFAULT_SAMPLES)
+        self.plot_widget.show_samples(model, xs, result.predict(xs))
+        self.expression_evaluated.emit(f"fit {model}", str(result))
+
 class HistoryWidget(QWidget):
     def __init__(self):
         super().__init__()
@@ -363,6 +766,7 @@ class HistoryWidget(QWidget):
         
         # History list with improved styling
         self.history_list = QListWidget()
+        self.entries = []  # (expression, result) pairs, kept for session snapshots
         self.update_list_style()
         layout.addWidget(self.history_list)
         
@@ -461,11 +865,20 @@ class HistoryWidget(QWidget):
         """)
 
     def add_entry(self, expression, result):
+        self.entries.append((expression, result))
         entry = f"{expression} = {result}"
         self.history_list.addItem(entry)
         self.history_list.scrollToBottom()
+
+    def add_entries(self, entries):
+        """Append many entries at once (e.g. a restored session) with a single scroll."""
+        entries = list(entries)
+        self.entries.extend(entries)
+        self.history_list.addItems([f"{expression} = {result}" for expression, result in entries])
+        self.history_list.scrollToBottom()
     
     def clear_history(self):
+        self.entries.clear()
         self.history_list.clear()
 
     def resizeEvent(self, event):
@@ -6,7 +6,12 @@ from PyQt5.QtWidgets import (
     QStackedWidget, QHBoxLayout, QPushButton, QSplitter
 )
 from PyQt5.QtCore import Qt, QSize
-from .calculator_widgets import CalculatorWidget, GraphicCalculatorWidget, HistoryWidget
+import numpy as np
+from core.programmer_calculator import WIDTHS
+from .calculator_widgets import CalculatorWidget, GraphicCalculatorWidget, ProgrammerCalculatorWidget, HistoryWidget
+from utils.session_utils import (
+    SessionSnapshot, SessionWriter, DEFAULT_SESSION_PATH, META, HISTORY, PLOT_PREFIX
+)
 
 class MainWindow(QMainWindow):
     def __init__(self):
@@ -30,7 +35,7 @@ class MainWindow(QMainWindow):
         # Mode selector and history button
         selector_layout = QHBoxLayout()
         self.mode_selector = QComboBox()
-        self.mode_selector.addItems(["Normal", "Scientific", "Graphic"])
+        self.mode_selector.addItems(["Normal", "Scientific", "Graphic", "Programmer"])
         self.mode_selector.setFixedHeight(32)
         self.mode_selector.setMinimumWidth(120)
         self.mode_selector.setStyleSheet("""
@@ -97,10 +102,12 @@ class MainWindow(QMainWindow):
         self.normal_widget = CalculatorWidget("Normal")
         self.scientific_widget = CalculatorWidget("Scientific")
         self.graphic_widget = GraphicCalculatorWidget()
+        self.programmer_widget = ProgrammerCalculatorWidget()
         
         self.stack.addWidget(self.normal_widget)
         self.stack.addWidget(self.scientific_widget)
         self.stack.addWidget(self.graphic_widget)
+        self.stack.addWidget(self.programmer_widget)
         self.calculator_layout.addWidget(self.stack)
 
         # Main splitter with sizing policy
@@ -121,16 +128,22 @@ class MainWindow(QMainWindow):
         self.mode_selector.currentTextChanged.connect(self.switch_mode)
         self.normal_widget.expression_evaluated.connect(self.add_to_history)
         self.scientific_widget.expression_evaluated.connect(self.add_to_history)
+        self.graphic_widget.expression_evaluated.connect(self.add_to_history)
+        self.programmer_widget.expression_evaluated.connect(self.add_to_history)
         self.splitter.splitterMoved.connect(self.on_splitter_moved)
         
         # Store sizes
         self.NORMAL_CALCULATOR_SIZE = QSize(400, 500)
         self.SCIENTIFIC_CALCULATOR_SIZE = QSize(600, 650)
+        self.PROGRAMMER_CALCULATOR_SIZE = QSize(600, 750)
         self.DEFAULT_HISTORY_WIDTH = 250
         self.MIN_HISTORY_WIDTH_THRESHOLD = 100 # Min width before history auto-hides
         self.MIN_CALCULATOR_WIDTH_WITH_HISTORY = self.NORMAL_CALCULATOR_SIZE.width() + self.MIN_HISTORY_WIDTH_THRESHOLD
 
+        self.session = None
+        self.plots_restored = False
         self.switch_mode("Normal")
+        self.restore_session()
 
     def _resize_window_for_mode(self, mode_size):
         current_size = self.size()
@@ -151,6 +164,11 @@ class MainWindow(QMainWindow):
             self.resize(new_width, new_height)
 
     def switch_mode(self, mode):
+        # Programmer mode needs room for its views above a usable button grid
+        margins = self.calculator_layout.contentsMargins()
+        chrome = margins.top() + margins.bottom() + self.calculator_layout.spacing() + self.mode_selector.height()
+        minimum = self.programmer_widget.minimum_height() + chrome if mode == "Programmer" else 0
+        self.setMinimumHeight(max(self.NORMAL_CALCULATOR_SIZE.height(), minimum))
         if mode == "Normal":
             self.stack.setCurrentWidget(self.normal_widget)
             self._resize_window_for_mode(self.NORMAL_CALCULATOR_SIZE)
@@ -159,8 +177,12 @@ class MainWindow(QMainWindow):
             self._resize_window_for_mode(self.SCIENTIFIC_CALCULATOR_SIZE)
         elif mode == "Graphic":
             self.stack.setCurrentWidget(self.graphic_widget)
+            self.restore_plots()
             # Assuming graphic mode might have its own preferred size
             # self._resize_window_for_mode(self.GRAPHIC_CALCULATOR_SIZE) # Example
+        elif mode == "Programmer":
+            self.stack.setCurrentWidget(self.programmer_widget)
+            self._resize_window_for_mode(self.PROGRAMMER_CALCULATOR_SIZE)
 
     def toggle_history(self):
         if self.history_widget.isHidden():
@@ -204,6 +226,102 @@ class MainWindow(QMainWindow):
                 self.history_widget.update_list_style()
                 self.history_widget.update_clear_button_style()
 
+    def restore_session(self, path=DEFAULT_SESSION_PATH):
+        try:
+            self.session = SessionSnapshot(path)
+        except (OSError, ValueError):
+            return  # No (usable) snapshot: start with a fresh session
+
+        # Only the small sections are decoded here; plot samples stay mapped
+        # until the graphic mode asks for them. A corrupt section only loses
+        # what is in it.
+        try:
+            meta = self.session.meta()
+        except ValueError:
+            meta = {}
+        for widget in (self.normal_widget, self.scientific_widget, self.graphic_widget):
+            try:
+                functions = self.session.functions(widget.mode_name)
+            except ValueError:
+                functions = []
+            for name, program, cases in functions:
+                try:
+                    if program is not None:
+                        widget.calculator.functions.register(name, program)
+                    for args, value in cases:
+                        widget.calculator.functions.set_case(name, args, value)
+                except ValueError:
+                    pass  # Skip definitions that no longer compile
+            widget.display.setText(meta.get(f"{widget.mode_name}.expression", ""))
+        angle_mode = meta.get("Scientific.angle_mode", "DEG")
+        self.scientific_widget.set_angle_mode_button(angle_mode if angle_mode in ("DEG", "RAD") else "DEG")
+        width = meta.get("Programmer.width", "64")
+        self.programmer_widget.set_options(int(width) if width in map(str, WIDTHS) else None,
+                                           meta.get("Programmer.signed", "1") == "1",
+                                           meta.get("Programmer.input_base", "DEC"))
+        self.programmer_widget.display.setText(meta.get("Programmer.expression", ""))
+        try:
+            history = self.session.history()
+        except ValueError:
+            history = []
+        self.history_widget.add_entries(history)
+        mode = meta.get("mode")
+        if mode and self.mode_selector.findText(mode) >= 0:
+            self.mode_selector.setCurrentText(mode)
+
+    def restore_plots(self):
+        # Plot samples are only decoded the first time the graphic mode is shown
+        if self.session is None or self.plots_restored:
+            return
+        self.plots_restored = True
+        if self.graphic_widget.plot_widget.samples:
+            return
+        for key in self.session.plot_keys():
+            try:
+                xs, ys = self.session.samples(key)
+            except ValueError:
+                continue  # A damaged plot section only loses that plot
+            self.graphic_widget.plot_widget.show_samples(key, np.array(xs), np.array(ys))
+            xs.release()
+            ys.release()
+
+    def save_session(self, path=DEFAULT_SESSION_PATH):
+        writer = SessionWriter()
+        meta = {
+            "mode": self.mode_selector.currentText(),
+            "Scientific.angle_mode": self.scientific_widget.angle_mode,
+            "Programmer.expression": self.programmer_widget.display.text(),
+            "Programmer.width": str(self.programmer_widget.calculator.width or ""),
+            "Programmer.signed": "1" if self.programmer_widget.calculator.signed else "0",
+            "Programmer.input_base": self.programmer_widget.base_selector.currentText(),
+        }
+        for widget in (self.normal_widget, self.scientific_widget, self.graphic_widget):
+            meta[f"{widget.mode_name}.expression"] = widget.display.text()
+            writer.add_functions(widget.mode_name, widget.calculator.functions)
+        writer.add_strings(META, [item for pair in meta.items() for item in pair])
+        writer.add_strings(HISTORY, [item for pair in self.history_widget.entries for item in pair])
+        plot_samples = self.graphic_widget.plot_widget.samples
+        if self.session is not None:
+            if not self.plots_restored and not plot_samples:
+                # Carry plot samples over untouched; the mapping must be
+                # closed before the file is replaced.
+                for key in self.session.plot_keys():
+                    raw = self.session.raw(PLOT_PREFIX + key)
+                    writer.add(PLOT_PREFIX + key, raw)
+                    raw.release()
+            self.session.close()
+            self.session = None
+        for key, (xs, ys) in plot_samples.items():
+            writer.add_samples(key, xs, ys)
+        writer.write(path)
+
+    def closeEvent(self, event):
+        try:
+            self.save_session()
+        except (OSError, ValueError):
+            pass  # Never block quitting on a failed snapshot
+        super().closeEvent(event)
+
     def on_splitter_moved(self, pos, index):
         # Update history panel styles when splitter is moved
         self.history_widget.update_list_style()
@@ -1,9 +1,46 @@
 """
 Plot widget for graphing functions.
 """
-from PyQt5.QtWidgets import QWidget
+from PyQt5.QtWidgets import QWidget, QVBoxLayout
+from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg
+from matplotlib.figure import Figure
+from utils.plot_utils import DEFAULT_RANGE, DEFAULT_SAMPLES, sample_function, draw_plot, style_figure
 
 class PlotWidget(QWidget):
     def __init__(self):
         super().__init__()
-        # TODO: Integrate matplotlib for plotting
+        self.figure = Figure()
+        style_figure(self.figure)
+        self.canvas = FigureCanvasQTAgg(self.figure)
+        self.ax = self.figure.add_subplot()
+        self.samples = {}  # expression -> (xs, ys), kept for session snapshots
+        self.data = None  # (xs, ys) of a loaded dataset
+
+        layout = QVBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.canvas)
+        self.setLayout(layout)
+        self.redraw()
+
+    def plot(self, expression, x_min=DEFAULT_RANGE[0], x_max=DEFAULT_RANGE[1],
+             samples=DEFAULT_SAMPLES, registry=None):
+        """Sample and show an expression in x. Raises ValueError for invalid input."""
+        self.samples = {expression: sample_function(expression, x_min, x_max, samples, registry)}
+        self.redraw()
+
+    def show_samples(self, expression, xs, ys):
+        """Show previously computed samples (e.g. restored from a session)."""
+        self.samples = {expression: (xs, ys)}
+        self.redraw()
+
+    def show_data(self, xs, ys):
+        """Show a dataset as points; curves added later are drawn on top."""
+        self.data = (xs, ys)
+        self.samples = {}
+        self.redraw()
+
+    def redraw(self):
+        self.ax.clear()
+        draw_plot(self.ax, [(expr, xs, ys) for expr, (xs, ys) in self.samples.items()],
+                  points=self.data)
+        self.canvas.draw_idle()
@@ -1,15 +1,37 @@
 """
 Entry point for the calculator app.
+
+    python calculator/main.py                                 start the GUI
+    python calculator/main.py export JOBS.json [--workers N]  export plots headlessly
 """
+import argparse
 import sys
-from PyQt5.QtWidgets import QApplication
-from gui.main_window import MainWindow
 
 def main():
+    from PyQt5.QtWidgets import QApplication
+    from gui.main_window import MainWindow
     app = QApplication(sys.argv)
     window = MainWindow()
     window.show()
     sys.exit(app.exec_())
 
+def export(argv):
+    parser = argparse.ArgumentParser(prog="main.py export",
+                                     description="Render function plots without a display.")
+    parser.add_argument("jobs", help="JSON job file listing expressions, ranges and outputs")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="number of worker processes (default: CPU count)")
+    args = parser.parse_args(argv)
+    # Imported here so exporting never loads Qt
+    from utils.export_utils import export_plots
+    try:
+        failures = export_plots(args.jobs, args.workers)
+    except (OSError, ValueError) as e:
+        parser.exit(2, f"error: {e}\n")
+    sys.exit(1 if failures else 0)
+
 if __name__ == "__main__":
-    main()
+    if len(sys.argv) > 1 and sys.argv[1] == "export":
+        export(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,164 @@
+"""
+Headless plot export: render many function plots to PNG/SVG/PDF or sample
+them to CSV, spread over a process pool.
+
+A job file is JSON, either a list of jobs or an object::
+
+    {
+        "functions": ["f(x) = x^3 - x"],
+        "defaults": {"x_min": -5, "x_max": 5, "samples": 2000},
+        "jobs": [
+            {"expression": "sin(x)", "output": "out/sin.png"},
+            {"expression": "f(x)", "x_min": -2, "x_max": 2, "output": "out/f.csv"}
+        ]
+    }
+
+Relative output paths are resolved against the job file's directory.
+"""
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from core.graphic_calculator import GraphicCalculator
+from utils.plot_utils import (
+    DEFAULT_RANGE, DEFAULT_SAMPLES, sample_function, draw_plot, style_figure, save_samples_csv
+)
+
+IMAGE_FORMATS = {".png", ".svg", ".pdf"}
+DATA_FORMATS = {".csv"}
+DEFAULT_SIZE = (8.0, 5.0)  # inches
+DEFAULT_DPI = 100
+
+# Per-worker state, created once by _init_worker
+_calculator = None
+_figure = None
+
+
+def load_jobs(path):
+    """
+    Read a job file and return ``(definitions, jobs)`` with defaults applied.
+    Raises ValueError for anything malformed, so bad input fails before any
+    worker starts.
+    """
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        data = {"jobs": data}
+    if not isinstance(data, dict):
+        raise ValueError("A job file must be a list of jobs or an object with 'jobs'")
+    defaults = data.get("defaults", {})
+    definitions = data.get("functions", [])
+    entries = data.get("jobs", [])
+    if not isinstance(defaults, dict):
+        raise ValueError("'defaults' must be an object")
+    if not isinstance(entries, list):
+        raise ValueError("'jobs' must be a list")
+    if not isinstance(definitions, list) or not all(isinstance(d, str) for d in definitions):
+        raise ValueError("'functions' must be a list of definitions")
+
+    # Compile the definitions once here; workers repeat this in _init_worker
+    calculator = GraphicCalculator()
+    for definition in definitions:
+        try:
+            calculator.define(definition)
+        except ValueError as e:
+            raise ValueError(f"Invalid function definition '{definition}': {e}")
+
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Job {index} must be an object")
+        job = {"x_min": DEFAULT_RANGE[0], "x_max": DEFAULT_RANGE[1], "samples": DEFAULT_SAMPLES,
+               "width": DEFAULT_SIZE[0], "height": DEFAULT_SIZE[1], "dpi": DEFAULT_DPI,
+               "title": None, **defaults, **entry}
+        _check_job(index, job)
+        job["output"] = os.path.join(base, job["output"])
+        jobs.append(job)
+    return definitions, jobs
+
+
+def _check_job(index, job):
+    for key in ("expression", "output"):
+        if not isinstance(job.get(key), str) or not job[key]:
+            raise ValueError(f"Job {index} needs a string '{key}'")
+    for key in ("x_min", "x_max", "width", "height", "dpi"):
+        value = job[key]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+            raise ValueError(f"Job {index}: '{key}' must be a number")
+    for key in ("width", "height", "dpi"):
+        if job[key] <= 0:
+            raise ValueError(f"Job {index}: '{key}' must be positive")
+    if isinstance(job["samples"], bool) or not isinstance(job["samples"], int) or job["samples"] < 2:
+        raise ValueError(f"Job {index}: 'samples' must be an integer of at least 2")
+    if not job["x_min"] < job["x_max"]:
+        raise ValueError(f"Job {index}: 'x_min' must be smaller than 'x_max'")
+    if job["title"] is not None and not isinstance(job["title"], str):
+        raise ValueError(f"Job {index}: 'title' must be a string")
+    extension = os.path.splitext(job["output"])[1].lower()
+    if extension not in IMAGE_FORMATS | DATA_FORMATS:
+        raise ValueError(f"Job {index}: unsupported output format '{extension}'")
+
+
+def _init_worker(definitions):
+    # Import matplotlib with the Agg backend once per worker and keep one
+    # figure around, so each job only pays for sampling and drawing.
+    global _calculator, _figure
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    _calculator = GraphicCalculator()
+    for definition in definitions:
+        _calculator.define(definition)
+    _figure = Figure()
+    FigureCanvasAgg(_figure)
+
+
+def run_job(job):
+    """Render or sample one job. Returns ``(output, seconds, error message or None)``."""
+    start = time.perf_counter()
+    try:
+        xs, ys = sample_function(job["expression"], float(job["x_min"]), float(job["x_max"]),
+                                 int(job["samples"]), _calculator.functions)
+        directory = os.path.dirname(job["output"])
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if os.path.splitext(job["output"])[1].lower() in DATA_FORMATS:
+            save_samples_csv(job["output"], xs, ys)
+        else:
+            _figure.clear()
+            _figure.set_size_inches(float(job["width"]), float(job["height"]))
+            style_figure(_figure)
+            draw_plot(_figure.add_subplot(), [(job["expression"], xs, ys)], job["title"])
+            _figure.savefig(job["output"], dpi=job["dpi"], facecolor=_figure.get_facecolor())
+    except (ValueError, ArithmeticError, OSError) as e:
+        return job["output"], time.perf_counter() - start, str(e)
+    return job["output"], time.perf_counter() - start, None
+
+
+def export_plots(path, workers=None, report=print):
+    """Run every job in a job file. Returns the number of failed jobs."""
+    definitions, jobs = load_jobs(path)
+    start = time.perf_counter()
+    failures = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(definitions,)) as pool:
+        futures = {pool.submit(run_job, job): job["output"] for job in jobs}
+        for future in as_completed(futures):
+            try:
+                output, seconds, error = future.result()
+            except Exception as e:
+                # e.g. a crashed worker; count the job and keep reporting the rest
+                output, seconds, error = futures[future], 0.0, f"{type(e).__name__}: {e}"
+            if error:
+                failures += 1
+                report(f"FAIL {output} ({seconds * 1000:.1f} ms): {error}")
+            else:
+                report(f"ok   {output} ({seconds * 1000:.1f} ms)")
+    elapsed = time.perf_counter() - start
+    report(f"{len(jobs) - failures}/{len(jobs)} jobs exported in {elapsed:.2f} s")
+    return failures
@@ -1,4 +1,75 @@
 """
 Plotting utility functions for the calculator.
+
+Sampling and drawing live here so the on-screen PlotWidget and the headless
+exporter produce identical plots.
 """
-# Placeholder for future plotting helpers
+import numpy as np
+
+from core.user_functions import FunctionRegistry, compile_expression
+
+DEFAULT_SAMPLES = 1000
+DEFAULT_RANGE = (-10.0, 10.0)
+
+BACKGROUND_COLOR = "#181818"
+AXES_COLOR = "#222222"
+GRID_COLOR = "#333333"
+TEXT_COLOR = "#dddddd"
+LINE_COLORS = ["#ff9500", "#4fc3f7", "#81c784", "#e57373", "#ba68c8"]
+POINT_COLOR = "#888888"
+# Datasets are thinned to this many points for drawing; fits use all of them
+MAX_DISPLAY_POINTS = 20000
+
+
+def sample_function(expression, x_min=DEFAULT_RANGE[0], x_max=DEFAULT_RANGE[1],
+                    samples=DEFAULT_SAMPLES, registry=None):
+    """
+    Evaluate an expression in ``x`` over an evenly spaced grid.
+    Returns ``(xs, ys)`` float arrays; points where the expression is
+    undefined are NaN so the plotted line breaks there.
+    """
+    if samples < 2:
+        raise ValueError("At least 2 samples are needed")
+    if not x_min < x_max:
+        raise ValueError("x_min must be smaller than x_max")
+    registry = registry if registry is not None else FunctionRegistry()
+    function = registry.vectorize(compile_expression(expression, ('x',)))
+    xs = np.linspace(x_min, x_max, int(samples))
+    with np.errstate(all='ignore'):
+        ys = np.broadcast_to(function(xs), xs.shape).astype(float)
+    ys[~np.isfinite(ys)] = np.nan
+    return xs, ys
+
+
+def style_figure(figure):
+    figure.set_facecolor(BACKGROUND_COLOR)
+
+
+def draw_plot(ax, curves, title=None, points=None):
+    """
+    Draw ``(label, xs, ys)`` curves on a matplotlib Axes in the app's theme,
+    optionally over a scatter of data ``points`` given as ``(xs, ys)``.
+    """
+    ax.set_facecolor(AXES_COLOR)
+    ax.grid(True, color=GRID_COLOR, linewidth=0.8)
+    ax.axhline(0, color=GRID_COLOR, linewidth=1.2)
+    ax.axvline(0, color=GRID_COLOR, linewidth=1.2)
+    for spine in ax.spines.values():
+        spine.set_color(GRID_COLOR)
+    ax.tick_params(colors=TEXT_COLOR)
+    if points is not None:
+        xs, ys = points
+        stride = max(1, len(xs) // MAX_DISPLAY_POINTS)
+        ax.scatter(xs[::stride], ys[::stride], s=4, color=POINT_COLOR, label="data")
+    for i, (label, xs, ys) in enumerate(curves):
+        ax.plot(xs, ys, color=LINE_COLORS[i % len(LINE_COLORS)], linewidth=1.8, label=label)
+    if curves and points is None:
+        ax.set_xlim(curves[0][1][0], curves[0][1][-1])
+    if curves or points is not None:
+        ax.legend(facecolor=AXES_COLOR, edgecolor=GRID_COLOR, labelcolor=TEXT_COLOR)
+    if title:
+        ax.set_title(title, color=TEXT_COLOR)
+
+
+def save_samples_csv(path, xs, ys):
+    np.savetxt(path, np.column_stack((xs, ys)), delimiter=",", header="x,y", comments="")
@@ -0,0 +1,347 @@
+"""
+Session snapshot: a compact, versioned binary file holding the calculator
+state (history, modes, current expressions, user functions, plot samples).
+
+Layout (little endian)::
+
+    header   magic b"CALS", u16 version, u16 reserved, u32 section count
+    table    per section: u16 name length, name (utf-8), u64 offset, u64 length
+    sections 8-byte aligned payloads
+
+Snapshots are opened through mmap and only the table is parsed up front;
+each section is decoded the first time it is requested, and plot samples
+are returned as zero-copy views into the mapping.
+"""
+import math
+import mmap
+import os
+import struct
+from array import array
+
+from core.user_functions import Program, compile_expression
+
+MAGIC = b"CALS"
+VERSION = 2
+DEFAULT_SESSION_PATH = os.path.join(os.path.expanduser("~"), ".calculator", "session.bin")
+
+_HEADER = struct.Struct("<4sHHI")
+_ENTRY = struct.Struct("<QQ")
+_U16 = struct.Struct("<H")
+_U32 = struct.Struct("<I")
+_U64 = struct.Struct("<Q")
+_F64 = struct.Struct("<d")
+
+# Integer constants above this cannot round-trip through a float64 array
+_MAX_EXACT_INT = 2 ** 53
+
+META = "meta"
+HISTORY = "history"
+FUNCTIONS_PREFIX = "functions/"
+PLOT_PREFIX = "plot/"
+
+
+def _encode_strings(strings):
+    parts = [_U32.pack(len(strings))]
+    for text in strings:
+        data = text.encode("utf-8")
+        parts.append(_U32.pack(len(data)))
+        parts.append(data)
+    return b"".join(parts)
+
+
+def _decode_strings(buffer, offset=0):
+    (count,) = _U32.unpack_from(buffer, offset)
+    offset += _U32.size
+    strings = []
+    for _ in range(count):
+        (length,) = _U32.unpack_from(buffer, offset)
+        offset += _U32.size
+        if offset + length > len(buffer):
+            raise ValueError("String runs past the end of its section")
+        strings.append(bytes(buffer[offset:offset + length]).decode("utf-8"))
+        offset += length
+    return strings, offset
+
+
+def _encode_array(values):
+    data = values.tobytes()
+    return _U32.pack(len(values)) + data
+
+
+def _decode_array(typecode, buffer, offset):
+    (count,) = _U32.unpack_from(buffer, offset)
+    offset += _U32.size
+    values = array(typecode)
+    size = count * values.itemsize
+    if offset + size > len(buffer):
+        raise ValueError("Array runs past the end of its section")
+    values.frombytes(bytes(buffer[offset:offset + size]))
+    return values, offset + size
+
+
+def _encode_number(value):
+    # Integers keep full precision (a base case can exceed any fixed width)
+    if isinstance(value, float):
+        return b"f" + _F64.pack(value)
+    value = int(value)
+    data = value.to_bytes(value.bit_length() // 8 + 1, "little", signed=True)
+    return b"i" + _U32.pack(len(data)) + data
+
+
+def _decode_number(buffer, offset):
+    kind = bytes(buffer[offset:offset + 1])
+    offset += 1
+    if kind == b"f":
+        return _F64.unpack_from(buffer, offset)[0], offset + _F64.size
+    if kind != b"i":
+        raise ValueError("Invalid number")
+    (length,) = _U32.unpack_from(buffer, offset)
+    offset += _U32.size
+    if offset + length > len(buffer):
+        raise ValueError("Number runs past the end of its section")
+    return int.from_bytes(buffer[offset:offset + length], "little", signed=True), offset + length
+
+
+def _encode_cases(cases):
+    parts = [_U32.pack(len(cases))]
+    for args, value in cases.items():
+        parts.append(_U32.pack(len(args)))
+        parts += [_encode_number(v) for v in (*args, value)]
+    return b"".join(parts)
+
+
+def _decode_cases(buffer, offset):
+    (count,) = _U32.unpack_from(buffer, offset)
+    offset += _U32.size
+    cases = []
+    for _ in range(count):
+        (arity,) = _U32.unpack_from(buffer, offset)
+        offset += _U32.size
+        numbers = []
+        for _ in range(arity + 1):
+            number, offset = _decode_number(buffer, offset)
+            numbers.append(number)
+        cases.append((tuple(numbers[:-1]), numbers[-1]))
+    return cases, offset
+
+
+def encode_functions(registry):
+    """Encode the compiled programs and base cases of a FunctionRegistry."""
+    parts = [_U32.pack(len(registry.functions))]
+    for name, function in registry.functions.items():
+        program = function.program
+        if program is None:
+            parts.append(_encode_strings([name, "", ""]))
+            code, consts, kinds = array("i"), array("d"), array("B")
+        else:
+            parts.append(_encode_strings([name, program.source, ",".join(program.params)]
+                                         + program.names))
+            exact = all(not isinstance(c, int) or abs(c) <= _MAX_EXACT_INT
+                        for c in program.consts)
+            # An empty code array tells the reader to recompile from source
+            code = array("i", [v for ins in program.code for v in ins] if exact else [])
+            consts = array("d", program.consts if exact else [])
+            kinds = array("B", [isinstance(c, int) for c in program.consts] if exact else [])
+        parts += [_encode_array(code), _encode_array(consts), _encode_array(kinds),
+                  _encode_cases(function.cases)]
+    return b"".join(parts)
+
+
+def decode_functions(buffer):
+    """Decode a functions section into ``(name, Program or None, [(args, value)])`` tuples."""
+    (count,) = _U32.unpack_from(buffer, 0)
+    offset = _U32.size
+    functions = []
+    for _ in range(count):
+        strings, offset = _decode_strings(buffer, offset)
+        code, offset = _decode_array("i", buffer, offset)
+        consts, offset = _decode_array("d", buffer, offset)
+        kinds, offset = _decode_array("B", buffer, offset)
+        cases, offset = _decode_cases(buffer, offset)
+        if len(strings) < 3 or not strings[0].isidentifier():
+            raise ValueError("Invalid function entry")
+        name, source, params = strings[:3]
+        program = None
+        if source:
+            params = tuple(params.split(",")) if params else ()
+            if code:
+                program = Program(
+                    source, params,
+                    [tuple(code[i:i + 3]) for i in range(0, len(code), 3)],
+                    _decode_consts(consts, kinds),
+                    strings[3:])
+                if len(code) % 3:
+                    raise ValueError(f"Truncated program for {name}")
+            else:
+                program = compile_expression(source, params)
+            # The interpreter trusts its programs, so check them before use
+            program.validate()
+        functions.append((name, program, cases))
+    return functions
+
+
+def _decode_consts(consts, kinds):
+    if len(kinds) != len(consts):
+        raise ValueError("Constant table is inconsistent")
+    values = []
+    for value, kind in zip(consts, kinds):
+        if kind and not (math.isfinite(value) and value == int(value)):
+            raise ValueError(f"Invalid integer constant {value}")
+        values.append(int(value) if kind else value)
+    return values
+
+
+def encode_samples(xs, ys):
+    """Encode plot samples as raw float64 arrays (anything with the buffer protocol or a list)."""
+    xs, ys = array("d", xs), array("d", ys)
+    if len(xs) != len(ys):
+        raise ValueError("Sample arrays must have the same length")
+    return _U64.pack(len(xs)) + xs.tobytes() + ys.tobytes()
+
+
+class SessionWriter:
+    """Collects encoded sections and writes them as one snapshot file."""
+
+    def __init__(self):
+        self.sections = {}
+
+    def add(self, name, payload):
+        self.sections[name] = bytes(payload)
+
+    def add_strings(self, name, strings):
+        self.add(name, _encode_strings(list(strings)))
+
+    def add_functions(self, mode_name, registry):
+        self.add(FUNCTIONS_PREFIX + mode_name, encode_functions(registry))
+
+    def add_samples(self, key, xs, ys):
+        self.add(PLOT_PREFIX + key, encode_samples(xs, ys))
+
+    def to_bytes(self):
+        names = [name.encode("utf-8") for name in self.sections]
+        table_size = sum(_U16.size + len(n) + _ENTRY.size for n in names)
+        offset = _align(_HEADER.size + table_size)
+        table, body = [], []
+        position = offset
+        for name, payload in zip(names, self.sections.values()):
+            table.append(_U16.pack(len(name)) + name + _ENTRY.pack(position, len(payload)))
+            padded = _align(len(payload))
+            body.append(payload + b"\0" * (padded - len(payload)))
+            position += padded
+        head = _HEADER.pack(MAGIC, VERSION, 0, len(names)) + b"".join(table)
+        return head + b"\0" * (offset - len(head)) + b"".join(body)
+
+    def write(self, path=DEFAULT_SESSION_PATH):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(self.to_bytes())
+        os.replace(temp_path, path)
+
+
+def _align(size):
+    return (size + 7) & ~7
+
+
+class SessionSnapshot:
+    """
+    A memory-mapped snapshot. Sections are decoded lazily and cached. Views
+    returned by raw() and samples() must be released before close(), and the
+    snapshot must be closed before the file is overwritten.
+    """
+
+    def __init__(self, path=DEFAULT_SESSION_PATH):
+        self.path = path
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        self._decoded = {}
+        try:
+            self.sections = self._read_table()
+        except struct.error:
+            self.close()
+            raise ValueError(f"{self.path} is truncated")
+        except ValueError:
+            self.close()
+            raise
+
+    def _read_table(self):
+        magic, version, _, count = _HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a calculator session")
+        if version != VERSION:
+            raise ValueError(f"Unsupported session version {version}")
+        sections = {}
+        offset = _HEADER.size
+        for _ in range(count):
+            (length,) = _U16.unpack_from(self._view, offset)
+            offset += _U16.size
+            name = bytes(self._view[offset:offset + length]).decode("utf-8")
+            offset += length
+            start, size = _ENTRY.unpack_from(self._view, offset)
+            offset += _ENTRY.size
+            if start + size > len(self._view):
+                raise ValueError(f"Section {name} is truncated")
+            sections[name] = (start, size)
+        return sections
+
+    def __contains__(self, name):
+        return name in self.sections
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def raw(self, name):
+        """Zero-copy view of a section payload."""
+        start, size = self.sections[name]
+        return self._view[start:start + size]
+
+    def _cached(self, name, decode):
+        """Decode a section once. Raises ValueError if it is corrupt."""
+        if name not in self._decoded:
+            try:
+                self._decoded[name] = decode(self.raw(name)) if name in self.sections else None
+            except struct.error:
+                raise ValueError(f"Section {name} of {self.path} is corrupt")
+        return self._decoded[name]
+
+    def strings(self, name):
+        return self._cached(name, lambda buffer: _decode_strings(buffer)[0]) or []
+
+    def meta(self):
+        items = self.strings(META)
+        return dict(zip(items[0::2], items[1::2]))
+
+    def history(self):
+        """History entries as ``(expression, result)`` pairs."""
+        items = self.strings(HISTORY)
+        return list(zip(items[0::2], items[1::2]))
+
+    def functions(self, mode_name):
+        return self._cached(FUNCTIONS_PREFIX + mode_name, decode_functions) or []
+
+    def plot_keys(self):
+        return [name[len(PLOT_PREFIX):] for name in self.sections if name.startswith(PLOT_PREFIX)]
+
+    def samples(self, key):
+        """Plot samples as two float64 memoryviews into the mapping (no copy)."""
+        buffer = self.raw(PLOT_PREFIX + key)
+        if len(buffer) < _U64.size:
+            raise ValueError(f"Plot section {key} is truncated")
+        (count,) = _U64.unpack_from(buffer, 0)
+        if _U64.size + 16 * count > len(buffer):
+            raise ValueError(f"Plot section {key} is truncated")
+        values = buffer[_U64.size:_U64.size + 16 * count].cast("d")
+        return values[:count], values[count:]
+
+    def close(self):
+        self._decoded.clear()
+        if self._map is not None:
+            self._view.release()
+            self._map.close()
+            self._map = None